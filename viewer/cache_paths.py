@@ -0,0 +1,10 @@
+"""
+Per-user cache locations shared by the loaders and viewers.
+"""
+
+import os
+
+
+# Everything derived from game files is cached under one directory per user
+CACHE_ROOT = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                          'kitopizzas')
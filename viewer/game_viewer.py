@@ -1,14 +1,26 @@
 import pygame
 from pygame.locals import *
+# PyOpenGL flags must be set before the first OpenGL.GL import: skip the
+# glGetError round trip after every call and the per-call logging wrappers.
+# Nothing keeps client-memory arrays for later draws, so pointer storage is off too
+import OpenGL
+OpenGL.ERROR_CHECKING = False
+OpenGL.ERROR_LOGGING = False
+OpenGL.STORE_POINTERS = False
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import numpy as np
 from wmb_loader import WMB
+from tex_unpack import rgb565_to_rgb, rgba4444_to_rgba
 from mdl_loader import MDL
-from viewer_utils import FileNavigator
+from viewer_utils import (FileNavigator, INPUT_EVENTS, PixelUploader, ScratchBuffer, TexturePool, compressed_format,
+                          delete_textures, decode_wmb_textures, camera_vectors, camera_view_matrix,
+                          cached_world_batches, BatchListCache, upload_render_batches,
+                          sort_batches_by_texture, world_batch_bounds, frustum_visible, BATCH_STRIDE, BATCH_UV_OFFSET,
+                          open_gl_window, parse_viewer_args)
+import ctypes
 import sys
 import os
-import math
 
 
 class ModelInstance:
@@ -27,15 +39,17 @@ class ModelInstance:
         self.frame_verts = []      # list of numpy arrays, one per frame
         self.vertex_count = 0      # number of vertices (triangles * 3)
         self.interpolated_verts = None  # reusable buffer for interpolated positions
+        self.texcoord_vbo = None   # static GL buffer holding texcoords
+        self.position_vbo = None   # GL buffer the interpolated positions are streamed into
         self.min_z = 0.0           # minimum Z of model (for ground placement)
 
 
 class GameViewer:
-    def __init__(self, folder=None):
+    def __init__(self, folder=None, vsync=False):
         self.width = 1024
         self.height = 768
         pygame.init()
-        self.screen = pygame.display.set_mode((self.width, self.height), DOUBLEBUF | OPENGL)
+        self.screen = open_gl_window((self.width, self.height), vsync)
         pygame.display.set_caption("Game Viewer")
 
         # File navigation
@@ -58,12 +72,22 @@ class GameViewer:
         glLoadIdentity()
         gluPerspective(60, (self.width / self.height), 1.0, 80000.0)
         glMatrixMode(GL_MODELVIEW)
+        # Kept for frustum culling; the projection never changes
+        self.projection = glGetFloatv(GL_PROJECTION_MATRIX)
+        self.view_projection = self.projection
 
         # WMB data
         self.wmb = None
         self.texture_ids = []
-        self.triangulated_faces = []
         self.render_batches = []
+        self.world_vbo = None
+        self.world_ibo = None
+        self.world_bounds = None
+        self.world_lists = BatchListCache()
+        # Texture names are recycled across file switches
+        self.texture_pool = TexturePool()
+        # Unpacked texture pixels are decoded into one reused buffer
+        self.decode_scratch = ScratchBuffer()
         self.load_error = None
 
         # Model instances
@@ -80,6 +104,8 @@ class GameViewer:
         self.mouse_captured = True
         pygame.mouse.set_visible(False)
         pygame.event.set_grab(True)
+        # Motion events would only flood the queue, the per-frame delta comes from get_rel()
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
 
         # Wireframe mode
         self.wireframe = False
@@ -103,7 +129,6 @@ class GameViewer:
 
         self.wmb = WMB()
         self.load_error = None
-        self.triangulated_faces = []
         self.render_batches = []
 
         try:
@@ -111,10 +136,12 @@ class GameViewer:
             self.texture_ids = self.load_world_textures()
             self.camera_pos = self.calculate_start_position()
 
-            # Pre-triangulate WMB4/WMB6 faces and build render batches
-            if self.wmb.version in [b'WMB4', b'WMB6']:
-                self.triangulated_faces = self.triangulate_faces()
-                self.render_batches = self.build_render_batches()
+            # Triangulate and batch the world, or reuse the batches cached by an earlier load
+            if self.wmb.version in [b'WMB4', b'WMB6', b'WMB7']:
+                vertices, batches = cached_world_batches(self.wmb, filename)
+                self.render_batches = sort_batches_by_texture(batches, self.texture_ids)
+                self.world_bounds = world_batch_bounds(self.wmb, vertices, self.render_batches)
+                self.world_vbo, self.world_ibo = upload_render_batches(vertices, self.render_batches)
 
             # Load models from entities
             self.load_entity_models()
@@ -141,17 +168,21 @@ class GameViewer:
         pygame.display.set_caption(f"Game Viewer - {os.path.basename(filename)}")
 
     def cleanup_textures(self):
-        """Delete OpenGL textures for world"""
-        for tex_id in self.texture_ids:
-            if tex_id is not None:
-                glDeleteTextures([tex_id])
+        """Release world textures to the pool and free the world buffers"""
+        self.texture_pool.release(self.texture_ids)
         self.texture_ids = []
+        self.world_lists.clear()
+        if self.world_vbo is not None:
+            glDeleteBuffers(2, [self.world_vbo, self.world_ibo])
+            self.world_vbo = None
+            self.world_ibo = None
 
     def cleanup_models(self):
-        """Delete OpenGL textures for models"""
-        for model in self.models:
-            if model.texture_id is not None:
-                glDeleteTextures([model.texture_id])
+        """Delete OpenGL textures and vertex buffers for models"""
+        delete_textures(model.texture_id for model in self.models)
+        vbos = [vbo for model in self.models for vbo in (model.texcoord_vbo, model.position_vbo) if vbo is not None]
+        if vbos:
+            glDeleteBuffers(len(vbos), vbos)
         self.models = []
 
     def load_entity_models(self):
@@ -239,13 +270,7 @@ class GameViewer:
         skin_type = skin['type']
 
         if skin_type in ['single_16bit', 'single_16bit_565']:
-            data = skin['data']
-            arr = np.frombuffer(data, dtype=np.uint16)
-            r = ((arr >> 11) & 0x1F) * 255 // 31
-            g = ((arr >> 5) & 0x3F) * 255 // 63
-            b = (arr & 0x1F) * 255 // 31
-            rgb = np.dstack((r, g, b)).astype(np.uint8).flatten()
-            texture_data = rgb.tobytes()
+            texture_data = rgb565_to_rgb(skin['data'], width, height, self.decode_scratch.get(width * height * 3))
 
             tex_id = glGenTextures(1)
             glBindTexture(GL_TEXTURE_2D, tex_id)
@@ -255,14 +280,7 @@ class GameViewer:
             return tex_id
 
         elif skin_type == 'single_16bit_4444':
-            data = skin['data']
-            arr = np.frombuffer(data, dtype=np.uint16)
-            a = ((arr >> 12) & 0xF) * 255 // 15
-            r = ((arr >> 8) & 0xF) * 255 // 15
-            g = ((arr >> 4) & 0xF) * 255 // 15
-            b = (arr & 0xF) * 255 // 15
-            rgba = np.dstack((r, g, b, a)).astype(np.uint8).flatten()
-            texture_data = rgba.tobytes()
+            texture_data = rgba4444_to_rgba(skin['data'], width, height, self.decode_scratch.get(width * height * 4))
 
             tex_id = glGenTextures(1)
             glBindTexture(GL_TEXTURE_2D, tex_id)
@@ -273,26 +291,22 @@ class GameViewer:
 
         elif skin_type == 'single_24bit_888':
             data = skin['data']
-            arr = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
-            rgb = arr[:, ::-1].flatten()
-            texture_data = rgb.tobytes()
+            texture_data = np.frombuffer(data, dtype=np.uint8)
 
             tex_id = glGenTextures(1)
             glBindTexture(GL_TEXTURE_2D, tex_id)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, texture_data)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, GL_BGR, GL_UNSIGNED_BYTE, texture_data)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
             return tex_id
 
         elif skin_type == 'single_32bit_8888':
             data = skin['data']
-            arr = np.frombuffer(data, dtype=np.uint8).reshape(-1, 4)
-            rgba = arr[:, [2, 1, 0, 3]].flatten()
-            texture_data = rgba.tobytes()
+            texture_data = np.frombuffer(data, dtype=np.uint8)
 
             tex_id = glGenTextures(1)
             glBindTexture(GL_TEXTURE_2D, tex_id)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, texture_data)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_BGRA, GL_UNSIGNED_BYTE, texture_data)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
             return tex_id
@@ -302,7 +316,7 @@ class GameViewer:
     def build_model_geometry(self, model):
         """Pre-build vertex arrays for fast model rendering"""
         mdl = model.mdl
-        if not mdl.triangles or not mdl.frames:
+        if len(mdl.triangles) == 0 or not mdl.frames:
             return
 
         # Get skin dimensions
@@ -410,6 +424,14 @@ class GameViewer:
         model.vertex_count = num_verts
         model.interpolated_verts = np.empty((num_verts, 3), dtype=np.float32)
 
+        # Texcoords never change, keep them on the GPU; positions are streamed per frame
+        model.texcoord_vbo, model.position_vbo = (int(vbo) for vbo in glGenBuffers(2))
+        glBindBuffer(GL_ARRAY_BUFFER, model.texcoord_vbo)
+        glBufferData(GL_ARRAY_BUFFER, texcoords.nbytes, texcoords, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, model.position_vbo)
+        glBufferData(GL_ARRAY_BUFFER, model.interpolated_verts.nbytes, None, GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
         # Calculate model's minimum Z for ground placement offset
         # Use first frame to determine bounding box
         if frame_verts:
@@ -425,178 +447,49 @@ class GameViewer:
                 return pos
 
         # Find world bounds
-        if self.wmb.version in [b'WMB4', b'WMB6'] and self.wmb.vertices:
-            min_x = min(v[0] for v in self.wmb.vertices)
-            max_x = max(v[0] for v in self.wmb.vertices)
-            min_y = min(v[1] for v in self.wmb.vertices)
-            max_y = max(v[1] for v in self.wmb.vertices)
-            min_z = min(v[2] for v in self.wmb.vertices)
-            max_z = max(v[2] for v in self.wmb.vertices)
-        elif self.wmb.blocks:
-            min_x = min(b['mins'][0] for b in self.wmb.blocks)
-            max_x = max(b['maxs'][0] for b in self.wmb.blocks)
-            min_y = min(b['mins'][1] for b in self.wmb.blocks)
-            max_y = max(b['maxs'][1] for b in self.wmb.blocks)
-            min_z = min(b['mins'][2] for b in self.wmb.blocks)
-            max_z = max(b['maxs'][2] for b in self.wmb.blocks)
+        if self.wmb.version in [b'WMB4', b'WMB6'] and len(self.wmb.vertices):
+            mins = self.wmb.vertices.min(axis=0)
+            maxs = self.wmb.vertices.max(axis=0)
+        elif len(self.wmb.block_bounds):
+            # The loader keeps the block boxes as one (n, 2, 3) array; reduce each side
+            boxes = self.wmb.block_bounds
+            mins = boxes[:, 0].min(axis=0)
+            maxs = boxes[:, 1].max(axis=0)
         else:
             return [0.0, 0.0, 100.0]
 
-        center_x = (min_x + max_x) / 2
-        center_y = (min_y + max_y) / 2
-        center_z = (min_z + max_z) / 2 + 100
-
-        return [center_x, center_y, center_z]
-
-    def triangulate_faces(self):
-        """Convert polygon faces to triangles"""
-        triangles = []
-
-        for face in self.wmb.faces:
-            verts = face['vertices']
-            if len(verts) < 3:
-                continue
-
-            texinfo_idx = face['tex_idx']
-            if texinfo_idx < len(self.wmb.texinfo):
-                texinfo = self.wmb.texinfo[texinfo_idx]
-                actual_tex = texinfo['texture']
-                s_vec = texinfo['s_vec']
-                s_off = texinfo['s_off']
-                t_vec = texinfo['t_vec']
-                t_off = texinfo['t_off']
-            else:
-                actual_tex = 0
-                s_vec = (1, 0, 0)
-                s_off = 0
-                t_vec = (0, 1, 0)
-                t_off = 0
-
-            positions = []
-            uvs = []
-            for v_idx in verts:
-                if v_idx < len(self.wmb.vertices):
-                    pos = self.wmb.vertices[v_idx]
-                    positions.append(pos)
-                    u = pos[0] * s_vec[0] + pos[1] * s_vec[1] + pos[2] * s_vec[2] + s_off
-                    v = pos[0] * t_vec[0] + pos[1] * t_vec[1] + pos[2] * t_vec[2] + t_off
-                    uvs.append((u, v))
-                else:
-                    positions.append((0, 0, 0))
-                    uvs.append((0, 0))
-
-            for i in range(1, len(positions) - 1):
-                triangles.append({
-                    'vertices': [positions[0], positions[i], positions[i + 1]],
-                    'uvs': [uvs[0], uvs[i], uvs[i + 1]],
-                    'texture': actual_tex,
-                    'flags': face['flags']
-                })
-
-        return triangles
-
-    def build_render_batches(self):
-        """Pre-build render batches grouped by texture"""
-        tex_groups = {}
-        for tri in self.triangulated_faces:
-            tex_idx = tri['texture']
-            if tex_idx not in tex_groups:
-                tex_groups[tex_idx] = []
-            tex_groups[tex_idx].append(tri)
-
-        batches = []
-        for tex_idx, tris in tex_groups.items():
-            tex_width = 64
-            tex_height = 64
-            if tex_idx < len(self.wmb.textures):
-                tex_width = self.wmb.textures[tex_idx]['width']
-                tex_height = self.wmb.textures[tex_idx]['height']
-
-            num_verts = len(tris) * 3
-            positions = np.empty((num_verts, 3), dtype=np.float32)
-            texcoords = np.empty((num_verts, 2), dtype=np.float32)
-
-            idx = 0
-            for tri in tris:
-                tri_verts = tri['vertices']
-                tri_uvs = tri['uvs']
-                for i in range(3):
-                    v = tri_verts[i]
-                    uv = tri_uvs[i]
-                    positions[idx] = (v[0], v[1], v[2])
-                    texcoords[idx] = (uv[0] / tex_width, uv[1] / tex_height)
-                    idx += 1
-
-            batches.append({
-                'texture_idx': tex_idx,
-                'positions': positions,
-                'texcoords': texcoords,
-                'vertex_count': num_verts
-            })
+        center = (mins + maxs) / 2
+        center[2] += 100
 
-        return batches
+        return center.tolist()
 
     def load_world_textures(self):
         """Load all world textures into OpenGL"""
         texture_ids = []
 
-        for i, tex in enumerate(self.wmb.textures):
-            if tex['data'] is None or tex['format'] == 'unknown' or tex['format'] == 'dds':
-                texture_ids.append(None)
-                continue
-
-            width = tex['width']
-            height = tex['height']
-
-            if tex['format'] == 'rgb565':
-                arr = np.frombuffer(tex['data'], dtype=np.uint16)
-                r = ((arr >> 11) & 0x1F) * 255 // 31
-                g = ((arr >> 5) & 0x3F) * 255 // 63
-                b = (arr & 0x1F) * 255 // 31
-                rgb = np.dstack((r, g, b)).astype(np.uint8).flatten()
-                texture_data = rgb.tobytes()
-                fmt = GL_RGB
-
-            elif tex['format'] == 'rgba8888':
-                arr = np.frombuffer(tex['data'], dtype=np.uint8).reshape(-1, 4)
-                rgba = arr[:, [2, 1, 0, 3]].flatten()
-                texture_data = rgba.tobytes()
-                fmt = GL_RGBA
-
-            elif tex['format'] == 'rgb888':
-                arr = np.frombuffer(tex['data'], dtype=np.uint8).reshape(-1, 3)
-                rgb = arr[:, ::-1].flatten()
-                texture_data = rgb.tobytes()
-                fmt = GL_RGB
-
-            elif tex['format'] == 'palette8':
-                arr = np.frombuffer(tex['data'], dtype=np.uint8).astype(np.uint16)
-                r = (arr).astype(np.uint8)
-                g = ((arr * 2) % 256).astype(np.uint8)
-                b = ((arr * 3) % 256).astype(np.uint8)
-                rgb = np.dstack((r, g, b)).flatten()
-                texture_data = rgb.tobytes()
-                fmt = GL_RGB
-
-            else:
-                texture_ids.append(None)
-                continue
+        with PixelUploader() as uploader:
+            for tex, decoded in zip(self.wmb.textures, decode_wmb_textures(self.wmb, self.decode_scratch)):
+                if decoded is None:
+                    texture_ids.append(None)
+                    continue
 
-            tex_id = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, tex_id)
+                width = tex['width']
+                height = tex['height']
+                texture_data, fmt = decoded
 
-            if fmt == GL_RGBA:
-                glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, texture_data)
-            else:
-                glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, texture_data)
+                # Compressed storage cuts the memory and bandwidth of sampling the world
+                internal_fmt = compressed_format(fmt, width, height)
+                tex_id, has_storage = self.texture_pool.acquire(width, height, internal_fmt)
+                glBindTexture(GL_TEXTURE_2D, tex_id)
+                uploader.tex_image_2d(internal_fmt, width, height, fmt, texture_data, has_storage)
 
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-            glGenerateMipmap(GL_TEXTURE_2D)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+                glGenerateMipmap(GL_TEXTURE_2D)
 
-            texture_ids.append(tex_id)
+                texture_ids.append(tex_id)
 
         return texture_ids
 
@@ -605,22 +498,25 @@ class GameViewer:
         self.mouse_captured = captured
         pygame.mouse.set_visible(not captured)
         pygame.event.set_grab(captured)
+        pygame.mouse.get_rel()  # Drop motion accumulated while released
 
     def handle_input(self, dt):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-            # Handle file navigation
-            action, data = self.file_nav.handle_event(event)
+        # Handle file navigation, coalesced over the whole event batch
+        events = pygame.event.get(eventtype=INPUT_EVENTS)
+        pygame.event.clear(pump=False)  # Discard the rest without converting them
+        actions, events = self.file_nav.handle_events(events)
+        for action, data in actions:
             if action == 'switch':
                 self.load_current_file()
-                continue
             elif action == 'toggle_list':
                 if data:
                     self.set_mouse_capture(False)
-                continue
+
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.texture_pool.delete_all()
+                pygame.quit()
+                sys.exit()
 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
@@ -630,6 +526,7 @@ class GameViewer:
                     elif not self.mouse_captured:
                         self.set_mouse_capture(True)
                     else:
+                        self.texture_pool.delete_all()
                         pygame.quit()
                         sys.exit()
                 elif event.key == pygame.K_TAB:
@@ -644,11 +541,6 @@ class GameViewer:
                     else:
                         glEnable(GL_CULL_FACE)
                         print("Culling: ON")
-            elif event.type == pygame.MOUSEMOTION and self.mouse_captured:
-                dx, dy = event.rel
-                self.camera_yaw += dx * self.mouse_sensitivity
-                self.camera_pitch -= dy * self.mouse_sensitivity
-                self.camera_pitch = max(-89.0, min(89.0, self.camera_pitch))
             elif event.type == pygame.MOUSEBUTTONDOWN and not self.mouse_captured:
                 if not self.file_nav.show_file_list or event.pos[0] > 320:
                     self.set_mouse_capture(True)
@@ -656,64 +548,44 @@ class GameViewer:
         if not self.mouse_captured:
             return
 
+        # Mouse look from the motion accumulated since the last frame
+        dx, dy = pygame.mouse.get_rel()
+        if dx or dy:
+            self.camera_yaw += dx * self.mouse_sensitivity
+            self.camera_pitch -= dy * self.mouse_sensitivity
+            self.camera_pitch = max(-89.0, min(89.0, self.camera_pitch))
+
         # Keyboard movement
         keys = pygame.key.get_pressed()
-        speed = self.move_speed * dt
+        move_forward = keys[K_w] - keys[K_s]
+        move_right = keys[K_d] - keys[K_a]
+        move_up = keys[K_SPACE] - keys[K_LCTRL]
+        if not (move_forward or move_right or move_up):
+            return
 
-        if keys[pygame.K_LSHIFT]:
+        speed = self.move_speed * dt
+        if keys[K_LSHIFT]:
             speed *= 3.0
 
-        yaw_rad = math.radians(self.camera_yaw)
-        pitch_rad = math.radians(self.camera_pitch)
-
-        forward = [
-            math.cos(pitch_rad) * math.sin(yaw_rad),
-            math.cos(pitch_rad) * math.cos(yaw_rad),
-            math.sin(pitch_rad)
-        ]
-        right = [
-            math.cos(yaw_rad),
-            -math.sin(yaw_rad),
-            0
-        ]
-
-        if keys[pygame.K_w]:
-            self.camera_pos[0] += forward[0] * speed
-            self.camera_pos[1] += forward[1] * speed
-            self.camera_pos[2] += forward[2] * speed
-        if keys[pygame.K_s]:
-            self.camera_pos[0] -= forward[0] * speed
-            self.camera_pos[1] -= forward[1] * speed
-            self.camera_pos[2] -= forward[2] * speed
-        if keys[pygame.K_a]:
-            self.camera_pos[0] -= right[0] * speed
-            self.camera_pos[1] -= right[1] * speed
-        if keys[pygame.K_d]:
-            self.camera_pos[0] += right[0] * speed
-            self.camera_pos[1] += right[1] * speed
-        if keys[pygame.K_SPACE]:
-            self.camera_pos[2] += speed
-        if keys[pygame.K_LCTRL]:
-            self.camera_pos[2] -= speed
+        pos = self.camera_pos
+        if move_forward or move_right:
+            forward, right = camera_vectors(self.camera_yaw, self.camera_pitch)
+            step_forward = move_forward * speed
+            step_right = move_right * speed
+            pos[0] += forward[0] * step_forward + right[0] * step_right
+            pos[1] += forward[1] * step_forward + right[1] * step_right
+            pos[2] += forward[2] * step_forward
+        if move_up:
+            pos[2] += move_up * speed
 
     def draw(self):
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glClearColor(0.4, 0.6, 0.8, 1.0)
 
-        glLoadIdentity()
-
-        # Calculate look direction
-        yaw_rad = math.radians(self.camera_yaw)
-        pitch_rad = math.radians(self.camera_pitch)
-
-        look_x = math.cos(pitch_rad) * math.sin(yaw_rad)
-        look_y = math.cos(pitch_rad) * math.cos(yaw_rad)
-        look_z = math.sin(pitch_rad)
-
-        cx, cy, cz = self.camera_pos
-        gluLookAt(cx, cy, cz,
-                  cx + look_x, cy + look_y, cz + look_z,
-                  0, 0, 1)
+        # Camera from the cached yaw/pitch basis; culling reuses the same matrix
+        view = camera_view_matrix(self.camera_pos, self.camera_yaw, self.camera_pitch)
+        glLoadMatrixf(view)
+        self.view_projection = view @ self.projection
 
         if self.wireframe:
             glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
@@ -722,9 +594,10 @@ class GameViewer:
             glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
 
         # Draw world geometry
-        if self.wmb and self.wmb.version in [b'WMB4', b'WMB6']:
+        wmb = self.wmb
+        if wmb and wmb.version in (b'WMB4', b'WMB6'):
             self.draw_wmb6()
-        elif self.wmb:
+        elif wmb:
             self.draw_wmb7()
 
         # Draw entity models
@@ -736,115 +609,140 @@ class GameViewer:
         pygame.display.flip()
 
     def draw_wmb6(self):
-        """Draw WMB6 level geometry using vertex arrays"""
-        if not self.render_batches:
+        """Draw WMB6 level geometry, replaying the compiled lists of the batches in view"""
+        if not self.render_batches or self.world_vbo is None:
             return
+        visible = frustum_visible(*self.world_bounds, self.view_projection)
+        self.world_lists.call(self.wireframe, self.compile_wmb6, visible)
 
+    def compile_wmb6(self, lists):
+        """Issue the WMB6 batches from the static world buffers (recorded into per-batch display lists)"""
+        lists.setup()
+
+        # Enable vertex arrays; all batches index one shared vertex table
+        glBindBuffer(GL_ARRAY_BUFFER, self.world_vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.world_ibo)
         glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, None)
+
+        # Texcoords come from each batch's texinfo planes applied to the object-space position
+        glTexGeni(GL_S, GL_TEXTURE_GEN_MODE, GL_OBJECT_LINEAR)
+        glTexGeni(GL_T, GL_TEXTURE_GEN_MODE, GL_OBJECT_LINEAR)
+        glEnable(GL_TEXTURE_GEN_S)
+        glEnable(GL_TEXTURE_GEN_T)
 
+        # Texture left bound by the previous batch (0 while texturing is off), so
+        # consecutive batches sharing a texture do not rebind it
+        bound = None
         for batch in self.render_batches:
             tex_idx = batch['texture_idx']
-            positions = batch['positions']
-            texcoords = batch['texcoords']
             vertex_count = batch['vertex_count']
 
-            has_texture = False
-            if not self.wireframe and tex_idx < len(self.texture_ids):
-                tex_id = self.texture_ids[tex_idx]
-                if tex_id is not None:
-                    glEnable(GL_TEXTURE_2D)
-                    glBindTexture(GL_TEXTURE_2D, tex_id)
-                    has_texture = True
+            tex_id = None if self.wireframe else batch['gl_tex']
+            has_texture = tex_id is not None
+            if has_texture and tex_id != bound:
+                lists.state(binds=1)
+                glEnable(GL_TEXTURE_2D)
+                glBindTexture(GL_TEXTURE_2D, tex_id)
+                bound = tex_id
 
-            if not has_texture and not self.wireframe:
+            if not has_texture and not self.wireframe and bound != 0:
+                lists.state(binds=0)
                 glDisable(GL_TEXTURE_2D)
+                bound = 0
+
+            lists.batch(vertex_count // 3)
 
             if not has_texture:
                 r = ((tex_idx * 37) % 200 + 55) / 255.0
                 g = ((tex_idx * 71) % 200 + 55) / 255.0
                 b = ((tex_idx * 113) % 200 + 55) / 255.0
                 glColor3f(r, g, b)
-                glDisableClientState(GL_TEXTURE_COORD_ARRAY)
             else:
                 glColor3f(1.0, 1.0, 1.0)
-                glEnableClientState(GL_TEXTURE_COORD_ARRAY)
-                glTexCoordPointer(2, GL_FLOAT, 0, texcoords)
+                glTexGenfv(GL_S, GL_OBJECT_PLANE, batch['s_plane'])
+                glTexGenfv(GL_T, GL_OBJECT_PLANE, batch['t_plane'])
+
+            glDrawElements(GL_TRIANGLES, vertex_count, GL_UNSIGNED_INT, ctypes.c_void_p(batch['first'] * 4))
 
-            glVertexPointer(3, GL_FLOAT, 0, positions)
-            glDrawArrays(GL_TRIANGLES, 0, vertex_count)
+        lists.teardown()
 
+        # Disable vertex arrays
+        glDisable(GL_TEXTURE_GEN_S)
+        glDisable(GL_TEXTURE_GEN_T)
         glDisableClientState(GL_VERTEX_ARRAY)
-        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
 
     def draw_wmb7(self):
-        """Draw WMB7 blocks"""
-        for block in self.wmb.blocks:
-            self.draw_block(block)
+        """Draw WMB7 blocks, replaying the compiled lists of the batches in view"""
+        if not self.render_batches or self.world_vbo is None:
+            return
+        visible = frustum_visible(*self.world_bounds, self.view_projection)
+        self.world_lists.call(self.wireframe, self.compile_wmb7, visible)
 
-    def draw_block(self, block):
-        """Draw a single WMB7 block"""
-        vertices = block['vertices']
-        triangles = block['triangles']
-        skins = block['skins']
+    def compile_wmb7(self, lists):
+        """Issue the WMB7 material batches from the static world buffers (recorded into per-batch display lists)"""
+        lists.setup()
 
-        if not triangles:
-            return
+        glBindBuffer(GL_ARRAY_BUFFER, self.world_vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.world_ibo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, BATCH_STRIDE, None)
+        glTexCoordPointer(2, GL_FLOAT, BATCH_STRIDE, BATCH_UV_OFFSET)
 
-        skin_tris = {}
-        for tri in triangles:
-            skin_idx = tri['skin']
-            if skin_idx not in skin_tris:
-                skin_tris[skin_idx] = []
-            skin_tris[skin_idx].append(tri)
+        # Texture left bound by the previous batch (0 while texturing is off), so
+        # consecutive batches sharing a texture do not rebind it
+        bound = None
+        for batch in self.render_batches:
+            vertex_count = batch['vertex_count']
 
-        for skin_idx, tris in skin_tris.items():
-            if skin_idx < 0 or skin_idx >= len(skins):
-                continue
+            tex_id = None if self.wireframe else batch['gl_tex']
+            has_texture = tex_id is not None
+            if has_texture and tex_id != bound:
+                lists.state(binds=1)
+                glEnable(GL_TEXTURE_2D)
+                glBindTexture(GL_TEXTURE_2D, tex_id)
+                bound = tex_id
 
-            skin = skins[skin_idx]
-            tex_idx = skin['texture']
-            flags = skin['flags']
+            if not has_texture and not self.wireframe and bound != 0:
+                lists.state(binds=0)
+                glDisable(GL_TEXTURE_2D)
+                bound = 0
 
-            is_sky = (flags & 2) != 0
+            lists.batch(vertex_count // 3)
 
-            if is_sky:
+            if batch['sky']:
                 glColor3f(0.5, 0.7, 1.0)
             else:
                 glColor3f(1.0, 1.0, 1.0)
 
-            has_texture = False
-            if not self.wireframe and tex_idx >= 0 and tex_idx < len(self.texture_ids):
-                tex_id = self.texture_ids[tex_idx]
-                if tex_id is not None:
-                    glEnable(GL_TEXTURE_2D)
-                    glBindTexture(GL_TEXTURE_2D, tex_id)
-                    has_texture = True
+            # Client state is applied at compile time, the list keeps the dereferenced arrays
+            if has_texture:
+                glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            else:
+                glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+
+            glDrawElements(GL_TRIANGLES, vertex_count, GL_UNSIGNED_INT, ctypes.c_void_p(batch['first'] * 4))
 
-            if not has_texture and not self.wireframe:
-                glDisable(GL_TEXTURE_2D)
+        lists.teardown()
 
-            glBegin(GL_TRIANGLES)
-            for tri in tris:
-                i1, i2, i3 = tri['indices']
-                for idx in [i1, i2, i3]:
-                    if idx < 0 or idx >= len(vertices):
-                        continue
-                    vert = vertices[idx]
-                    if has_texture:
-                        glTexCoord2f(vert['uv'][0], vert['uv'][1])
-                    glVertex3f(vert['pos'][0], vert['pos'][1], vert['pos'][2])
-            glEnd()
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
 
     def draw_models(self):
         """Draw all entity models"""
         # Temporarily change cull face for models (MDL uses front-face culling)
         glCullFace(GL_FRONT)
 
+        draw_model = self.draw_model
         for model in self.models:
             if model.mdl is None or not model.mdl.frames:
                 continue
 
-            self.draw_model(model)
+            draw_model(model)
 
         # Restore cull face for world
         glCullFace(GL_BACK)
@@ -886,44 +784,53 @@ class GameViewer:
             glColor3f(0.8, 0.6, 0.4)
 
         # Calculate frame interpolation
-        num_frames = len(model.frame_verts)
-        frame_idx_1 = int(self.frame_index) % num_frames
+        frame_verts = model.frame_verts
+        num_frames = len(frame_verts)
+        frame_index = self.frame_index
+        whole_frame = int(frame_index)
+        frame_idx_1 = whole_frame % num_frames
         frame_idx_2 = (frame_idx_1 + 1) % num_frames
-        alpha = self.frame_index - int(self.frame_index)
+        alpha = frame_index - whole_frame
 
         # Interpolate vertex positions using numpy (fast vectorized operation)
-        verts1 = model.frame_verts[frame_idx_1]
-        verts2 = model.frame_verts[frame_idx_2]
+        verts1 = frame_verts[frame_idx_1]
+        verts2 = frame_verts[frame_idx_2]
 
         # Use pre-allocated buffer for interpolated vertices
-        np.multiply(verts1, 1.0 - alpha, out=model.interpolated_verts)
-        model.interpolated_verts += verts2 * alpha
+        interpolated = model.interpolated_verts
+        np.multiply(verts1, 1.0 - alpha, out=interpolated)
+        interpolated += verts2 * alpha
 
-        # Draw using vertex arrays
+        # Stream this frame's positions, orphaning the storage the previous draw may still read
+        glBindBuffer(GL_ARRAY_BUFFER, model.position_vbo)
+        glBufferData(GL_ARRAY_BUFFER, interpolated.nbytes, interpolated, GL_STREAM_DRAW)
         glEnableClientState(GL_VERTEX_ARRAY)
-        glVertexPointer(3, GL_FLOAT, 0, model.interpolated_verts)
+        glVertexPointer(3, GL_FLOAT, 0, None)
 
-        if has_texture and model.texcoords is not None:
+        if has_texture:
+            glBindBuffer(GL_ARRAY_BUFFER, model.texcoord_vbo)
             glEnableClientState(GL_TEXTURE_COORD_ARRAY)
-            glTexCoordPointer(2, GL_FLOAT, 0, model.texcoords)
+            glTexCoordPointer(2, GL_FLOAT, 0, None)
 
         glDrawArrays(GL_TRIANGLES, 0, model.vertex_count)
 
         glDisableClientState(GL_VERTEX_ARRAY)
         glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
 
         glPopMatrix()
 
     def draw_overlay(self):
         """Draw file info and controls overlay"""
         extra_info = None
-        if self.wmb and not self.load_error:
-            version = self.wmb.version.decode() if self.wmb.version else 'Unknown'
+        wmb = self.wmb
+        if wmb and not self.load_error:
+            version = wmb.version.decode() if wmb.version else 'Unknown'
             model_count = len(self.models)
-            if self.wmb.version in [b'WMB4', b'WMB6']:
-                extra_info = f"{version} | Faces: {len(self.wmb.faces)} | Models: {model_count}"
+            if wmb.version in (b'WMB4', b'WMB6'):
+                extra_info = f"{version} | Faces: {wmb.num_faces} | Models: {model_count}"
             else:
-                extra_info = f"{version} | Blocks: {len(self.wmb.blocks)} | Models: {model_count}"
+                extra_info = f"{version} | Blocks: {len(wmb.blocks)} | Models: {model_count}"
 
         controls = "WASD: move | Tab: release mouse | L: file list | F1: wireframe"
         if not self.mouse_captured:
@@ -972,6 +879,6 @@ class GameViewer:
 
 
 if __name__ == "__main__":
-    folder = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
-    viewer = GameViewer(folder)
+    folder, vsync = parse_viewer_args(sys.argv[1:])
+    viewer = GameViewer(folder, vsync)
     viewer.run()
@@ -2,13 +2,18 @@ import struct
 import numpy as np
 
 class MDL:
-    def __init__(self):
+    def __init__(self, verbose=False):
         self.header = {}
         self.skins = []
         self.texcoords = []      # For IDPO: list of (onseam, s, t)
         self.skinverts = []      # For MDL3/4/5: list of (u, v) skin vertices
         self.triangles = []
         self.frames = []
+        self.verbose = verbose  # Print per-list/per-record details while loading
+
+    def _log(self, msg):
+        if self.verbose:
+            print(msg)
 
     def load(self, filename):
         with open(filename, 'rb') as f:
@@ -55,13 +60,13 @@ class MDL:
             'size': unpacked[20]
         }
 
-        print(f"Loaded MDL format: IDPO (version {self.header['version']})")
+        self._log(f"Loaded MDL format: IDPO (version {self.header['version']})")
 
         # Skins
         for _ in range(self.header['num_skins']):
             skin_type = struct.unpack_from('<I', data, offset)[0]
             offset += 4
-            print(f"Skin type: {skin_type}")
+            self._log(f"Skin type: {skin_type}")
 
             width = self.header['skinwidth']
             height = self.header['skinheight']
@@ -98,10 +103,10 @@ class MDL:
                 self.skins.append({'type': 'single_32bit_8888', 'data': skin_data})
             elif skin_type == 1:
                 # Group of 8-bit skins
-                print(f"Group skin detected (8-bit)")
+                self._log(f"Group skin detected (8-bit)")
                 nb = struct.unpack_from('<I', data, offset)[0]
                 offset += 4
-                print(f"Number of skins in group: {nb}")
+                self._log(f"Number of skins in group: {nb}")
 
                 times = struct.unpack_from(f'<{nb}f', data, offset)
                 offset += nb * 4
@@ -211,10 +216,10 @@ class MDL:
             'size': 0.0
         }
 
-        print(f"Loaded MDL format: {self.header['ident'].decode('latin-1')}")
-        print(f"  Scale: {self.header['scale']}")
-        print(f"  Translate: {self.header['translate']}")
-        print(f"  Verts: {self.header['num_verts']}, SkinVerts: {self.header['num_skinverts']}, Tris: {self.header['num_tris']}, Frames: {self.header['num_frames']}")
+        self._log(f"Loaded MDL format: {self.header['ident'].decode('latin-1')}")
+        self._log(f"  Scale: {self.header['scale']}")
+        self._log(f"  Translate: {self.header['translate']}")
+        self._log(f"  Verts: {self.header['num_verts']}, SkinVerts: {self.header['num_skinverts']}, Tris: {self.header['num_tris']}, Frames: {self.header['num_frames']}")
 
         # Skins - each has a skintype prefix
         for skin_idx in range(self.header['num_skins']):
@@ -273,7 +278,7 @@ class MDL:
                 'height': skin_height,
                 'data': skin_data
             })
-            print(f"  Skin {skin_idx}: type={skintype}, {skin_width}x{skin_height}, bpp={bpp}")
+            self._log(f"  Skin {skin_idx}: type={skintype}, {skin_width}x{skin_height}, bpp={bpp}")
 
         # Skin vertices (UV coords) - numskinverts entries
         # Each is: short u, short v
@@ -399,8 +404,8 @@ class MDL:
             'translate': (0.0, 0.0, 0.0),
         }
         
-        print(f"Loaded MDL format: MDL7 (version {self.header['version']})")
-        print(f"  Bones: {self.header['bones_num']}, Groups: {self.header['groups_num']}")
+        self._log(f"Loaded MDL format: MDL7 (version {self.header['version']})")
+        self._log(f"  Bones: {self.header['bones_num']}, Groups: {self.header['groups_num']}")
         
         # Read bones (skip for now, but need to advance offset)
         # MD7_BONE: unsigned short parent_index, BYTE[2], float x,y,z, char name[20]
@@ -410,7 +415,8 @@ class MDL:
         # Read groups - we'll combine all groups into one mesh for simplicity
         all_verts = []
         all_skinverts = []
-        all_triangles = []
+        # Per-group (numtris, 6) int32 slabs, joined once at the end
+        tri_slabs = []
         vertex_offset = 0
         skinvert_offset = 0
         
@@ -433,7 +439,7 @@ class MDL:
             num_verts = group_data[9]
             num_frames = group_data[10]
             
-            print(f"  Group {group_idx}: '{group_name}' - skins={num_skins}, stpts={num_stpts}, tris={num_tris}, verts={num_verts}, frames={num_frames}")
+            self._log(f"  Group {group_idx}: '{group_name}' - skins={num_skins}, stpts={num_stpts}, tris={num_tris}, verts={num_verts}, frames={num_frames}")
             
             # Read skins for this group
             for skin_idx in range(num_skins):
@@ -456,15 +462,15 @@ class MDL:
                 
                 if has_material or base_type == 1:
                     # Material reference, no pixel data
-                    print(f"    Skin {skin_idx}: material reference '{skin_name}'")
+                    self._log(f"    Skin {skin_idx}: material reference '{skin_name}'")
                     continue
                 elif base_type == 6:
                     # DDS file - skip for now
-                    print(f"    Skin {skin_idx}: DDS file (not supported)")
+                    self._log(f"    Skin {skin_idx}: DDS file (not supported)")
                     continue
                 elif base_type == 7:
                     # External file reference
-                    print(f"    Skin {skin_idx}: external file '{skin_name}'")
+                    self._log(f"    Skin {skin_idx}: external file '{skin_name}'")
                     continue
                 
                 if base_type == 0:
@@ -509,7 +515,7 @@ class MDL:
                         })
                         self.header['skinwidth'] = skin_width
                         self.header['skinheight'] = skin_height
-                        print(f"    Skin {skin_idx}: {skin_type_str} {skin_width}x{skin_height}")
+                        self._log(f"    Skin {skin_idx}: {skin_type_str} {skin_width}x{skin_height}")
             
             # Read skin points (UV coordinates) - floats 0.0-1.0
             # MD7_SKINPOINT: float s, float t
@@ -524,22 +530,17 @@ class MDL:
             # MD7_TRIANGLE: unsigned short v_index[3], then MD7_SKINSET[2]
             # MD7_SKINSET: unsigned short st_index[3], int material
             triangle_stc_size = self.header['triangle_stc_size']
-            for _ in range(num_tris):
-                # Read vertex indices
-                v0, v1, v2 = struct.unpack_from('<3H', data, offset)
-                # Read first skinset (UV indices)
-                uv0, uv1, uv2 = struct.unpack_from('<3H', data, offset + 6)
-                offset += triangle_stc_size
-                
+            if num_tris > 0:
+                # Strided view over the records: v_index[3] followed by the
+                # first skinset's st_index[3] are six consecutive ushorts
+                raw = np.ndarray((num_tris, 6), dtype='<u2', buffer=data, offset=offset,
+                                 strides=(triangle_stc_size, 2))
+                slab = raw.astype(np.int32)
                 # Adjust indices by vertex/skinvert offset for this group
-                all_triangles.append((
-                    v0 + vertex_offset,
-                    v1 + vertex_offset,
-                    v2 + vertex_offset,
-                    uv0 + skinvert_offset,
-                    uv1 + skinvert_offset,
-                    uv2 + skinvert_offset
-                ))
+                slab[:, :3] += vertex_offset
+                slab[:, 3:] += skinvert_offset
+                tri_slabs.append(slab)
+            offset += num_tris * triangle_stc_size
             
             # Read main vertices
             # MD7_MAINVERTEX: float x,y,z, unsigned short bone_index, then normal
@@ -593,12 +594,17 @@ class MDL:
         
         # Store combined data
         self.skinverts = all_skinverts
-        self.triangles = all_triangles
+        if len(tri_slabs) == 1:
+            self.triangles = tri_slabs[0]
+        elif tri_slabs:
+            self.triangles = np.concatenate(tri_slabs)
+        else:
+            self.triangles = np.empty((0, 6), dtype=np.int32)
         self.header['num_verts'] = vertex_offset
-        self.header['num_tris'] = len(all_triangles)
+        self.header['num_tris'] = len(self.triangles)
         self.header['num_frames'] = len(self.frames)
         self.header['num_skinverts'] = skinvert_offset
         
-        print(f"Loaded MDL7: total verts={vertex_offset}, tris={len(all_triangles)}, frames={len(self.frames)}")
+        print(f"Loaded MDL7: total verts={vertex_offset}, tris={len(self.triangles)}, frames={len(self.frames)}")
 
 
@@ -1,21 +1,30 @@
 import pygame
 from pygame.locals import *
+# PyOpenGL flags must be set before the first OpenGL.GL import: skip the
+# glGetError round trip after every call and the per-call logging wrappers.
+# Nothing keeps client-memory arrays for later draws, so pointer storage is off too
+import OpenGL
+OpenGL.ERROR_CHECKING = False
+OpenGL.ERROR_LOGGING = False
+OpenGL.STORE_POINTERS = False
 from OpenGL.GL import *
 from OpenGL.GLU import *
 import numpy as np
 from mdl_loader import MDL
-from viewer_utils import FileNavigator
+from tex_unpack import rgb565_to_rgb, rgba4444_to_rgba
+from viewer_utils import FileNavigator, delete_textures, open_gl_window, parse_viewer_args
+import ctypes
 import sys
 import os
 
 
 class MDLViewer:
-    def __init__(self, folder=None):
+    def __init__(self, folder=None, vsync=False):
         self.width = 800
         self.height = 600
         pygame.init()
         pygame.font.init()
-        self.screen = pygame.display.set_mode((self.width, self.height), DOUBLEBUF | OPENGL)
+        self.screen = open_gl_window((self.width, self.height), vsync)
         pygame.display.set_caption("MDL Viewer")
 
         # File navigation
@@ -31,6 +40,9 @@ class MDLViewer:
         self.mdl = None
         self.texture_id = None
         self.load_error = None
+        # Per-corner positions for every frame, and the interleaved xyz+uv array drawn from
+        self.frame_positions = []
+        self.model_verts = np.empty((0, 5), dtype=np.float32)
 
         # Setup OpenGL state
         glEnable(GL_DEPTH_TEST)
@@ -59,7 +71,7 @@ class MDLViewer:
     def load_current_file(self):
         """Load the MDL file at current_index"""
         if self.texture_id:
-            glDeleteTextures([self.texture_id])
+            delete_textures((self.texture_id,))
             self.texture_id = None
 
         filename = self.file_nav.current_file
@@ -71,12 +83,15 @@ class MDLViewer:
             self.mdl.load(filename)
             self.texture_id = self.load_texture()
             self.zoom = self.calculate_auto_zoom()
+            self.build_model_arrays()
         except Exception as e:
             print(f"Error loading {filename}: {e}")
             self.load_error = str(e)
             self.mdl.frames = [{'verts': [], 'name': 'error'}]
             self.mdl.triangles = []
             self.zoom = 50.0
+            self.frame_positions = []
+            self.model_verts = np.empty((0, 5), dtype=np.float32)
 
         self.frame_index = 0
         self.rotate_x = 0
@@ -129,6 +144,45 @@ class MDLViewer:
         print(f"Auto zoom: {zoom:.2f}")
         return zoom
 
+    def build_model_arrays(self):
+        """Unroll the triangles into per-corner arrays: frame positions plus one interleaved xyz+uv array"""
+        mdl = self.mdl
+        tris = np.asarray(mdl.triangles, dtype=np.int64)
+        if not len(tris) or not mdl.frames:
+            self.frame_positions = []
+            self.model_verts = np.empty((0, 5), dtype=np.float32)
+            return
+
+        # Get skin dimensions - MDL3/4/5 store per-skin, IDPO uses header
+        if mdl.skins and 'width' in mdl.skins[0]:
+            skin_width = mdl.skins[0]['width']
+            skin_height = mdl.skins[0]['height']
+        else:
+            skin_width = mdl.header['skinwidth']
+            skin_height = mdl.header['skinheight']
+
+        ident = mdl.header['ident']
+        if ident == b'IDPO':
+            # IDPO format: (facesfront, v0, v1, v2), texcoords are (onseam, s, t) per vertex
+            vert_idx = tris[:, 1:4].ravel()
+            st = np.asarray(mdl.texcoords, dtype=np.float32)[vert_idx]
+            back_seam = (np.repeat(tris[:, 0], 3) == 0) & (st[:, 0] != 0)
+            s = st[:, 1] + back_seam * (skin_width // 2)
+            uvs = np.column_stack([s / skin_width, st[:, 2] / skin_height])
+        else:
+            # MDL3/4/5/7 format: (xyz0, xyz1, xyz2, uv0, uv1, uv2)
+            vert_idx = tris[:, 0:3].ravel()
+            uvs = np.asarray(mdl.skinverts, dtype=np.float32).reshape(-1, 2)[tris[:, 3:6].ravel()]
+            if ident != b'MDL7':
+                # MDL7 skin vertices are already normalized floats
+                uvs = uvs / (skin_width, skin_height)
+
+        self.frame_positions = [np.asarray(frame['verts'], dtype=np.float32).reshape(-1, 3)[vert_idx]
+                                for frame in mdl.frames]
+        # Texcoords are fixed, positions are rewritten in place each frame
+        self.model_verts = np.empty((len(vert_idx), 5), dtype=np.float32)
+        self.model_verts[:, 3:] = uvs
+
     def load_texture(self):
         if not self.mdl.skins:
             return None
@@ -147,15 +201,7 @@ class MDLViewer:
 
         if skin_type in ['single_16bit', 'single_16bit_565']:
             # Convert RGB565 to RGB
-            data = skin['data']
-            arr = np.frombuffer(data, dtype=np.uint16)
-
-            r = ((arr >> 11) & 0x1F) * 255 // 31
-            g = ((arr >> 5) & 0x3F) * 255 // 63
-            b = (arr & 0x1F) * 255 // 31
-
-            rgb = np.dstack((r, g, b)).astype(np.uint8).flatten()
-            texture_data = rgb.tobytes()
+            texture_data = rgb565_to_rgb(skin['data'], width, height)
 
             tex_id = glGenTextures(1)
             glBindTexture(GL_TEXTURE_2D, tex_id)
@@ -166,16 +212,7 @@ class MDLViewer:
 
         elif skin_type == 'single_16bit_4444':
             # Convert ARGB4444 to RGBA
-            data = skin['data']
-            arr = np.frombuffer(data, dtype=np.uint16)
-
-            a = ((arr >> 12) & 0xF) * 255 // 15
-            r = ((arr >> 8) & 0xF) * 255 // 15
-            g = ((arr >> 4) & 0xF) * 255 // 15
-            b = (arr & 0xF) * 255 // 15
-
-            rgba = np.dstack((r, g, b, a)).astype(np.uint8).flatten()
-            texture_data = rgba.tobytes()
+            texture_data = rgba4444_to_rgba(skin['data'], width, height)
 
             tex_id = glGenTextures(1)
             glBindTexture(GL_TEXTURE_2D, tex_id)
@@ -187,15 +224,11 @@ class MDLViewer:
         elif skin_type == 'single_24bit_888':
             # 24-bit RGB (BGR in file, Intel byte order)
             data = skin['data']
-            arr = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
-
-            # BGR -> RGB
-            rgb = arr[:, ::-1].flatten()
-            texture_data = rgb.tobytes()
+            texture_data = np.frombuffer(data, dtype=np.uint8)
 
             tex_id = glGenTextures(1)
             glBindTexture(GL_TEXTURE_2D, tex_id)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, texture_data)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, GL_BGR, GL_UNSIGNED_BYTE, texture_data)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
             return tex_id
@@ -203,15 +236,11 @@ class MDLViewer:
         elif skin_type == 'single_32bit_8888':
             # 32-bit ARGB (BGRA in file, Intel byte order: B, G, R, A)
             data = skin['data']
-            arr = np.frombuffer(data, dtype=np.uint8).reshape(-1, 4)
-
-            # BGRA -> RGBA
-            rgba = arr[:, [2, 1, 0, 3]].flatten()
-            texture_data = rgba.tobytes()
+            texture_data = np.frombuffer(data, dtype=np.uint8)
 
             tex_id = glGenTextures(1)
             glBindTexture(GL_TEXTURE_2D, tex_id)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, texture_data)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_BGRA, GL_UNSIGNED_BYTE, texture_data)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
             glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
             return tex_id
@@ -225,19 +254,17 @@ class MDLViewer:
             return None
 
     def handle_input(self):
-        for event in pygame.event.get():
+        # Handle file navigation, coalesced over the whole event batch
+        actions, events = self.file_nav.handle_events(pygame.event.get())
+        for action, data in actions:
+            if action == 'switch':
+                self.load_current_file()
+
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
 
-            # Handle file navigation
-            action, data = self.file_nav.handle_event(event)
-            if action == 'switch':
-                self.load_current_file()
-                continue
-            elif action == 'toggle_list':
-                continue
-
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
                     if self.file_nav.show_file_list:
@@ -308,118 +335,27 @@ class MDLViewer:
         else:
             glDisable(GL_TEXTURE_2D)
 
-        glBegin(GL_TRIANGLES)
-
         # Interpolation
-        if self.mdl.frames:
+        model_verts = self.model_verts
+        if self.frame_positions and len(model_verts):
             frame_idx_1 = int(self.frame_index)
-            frame_idx_2 = (frame_idx_1 + 1) % len(self.mdl.frames)
+            frame_idx_2 = (frame_idx_1 + 1) % len(self.frame_positions)
             alpha = self.frame_index - frame_idx_1
 
-            frame1 = self.mdl.frames[frame_idx_1]
-            frame2 = self.mdl.frames[frame_idx_2]
-
-            verts1 = frame1['verts']
-            verts2 = frame2['verts']
-
-            # Get skin dimensions - MDL3/4/5 store per-skin, IDPO uses header
-            if self.mdl.skins and 'width' in self.mdl.skins[0]:
-                skin_width = self.mdl.skins[0]['width']
-                skin_height = self.mdl.skins[0]['height']
-            else:
-                skin_width = self.mdl.header['skinwidth']
-                skin_height = self.mdl.header['skinheight']
-
-            # Check format type
-            ident = self.mdl.header['ident']
-            is_idpo = ident == b'IDPO'
-            is_mdl7 = ident == b'MDL7'
-
-            for tri in self.mdl.triangles:
-                if is_idpo:
-                    # IDPO format: (facesfront, v0, v1, v2)
-                    facesfront = tri[0]
-                    vert_indices = tri[1:4]
-
-                    for i, v_idx in enumerate(vert_indices):
-                        # Texture coords
-                        st = self.mdl.texcoords[v_idx]
-                        onseam = st[0]
-                        s = st[1]
-                        t = st[2]
-
-                        if not facesfront and onseam:
-                            s += skin_width // 2
-
-                        u = s / skin_width
-                        v = t / skin_height
-
-                        glTexCoord2f(u, v)
-
-                        # Vertex Interpolation
-                        v1 = verts1[v_idx]
-                        v2 = verts2[v_idx]
-
-                        vx = v1[0] * (1 - alpha) + v2[0] * alpha
-                        vy = v1[1] * (1 - alpha) + v2[1] * alpha
-                        vz = v1[2] * (1 - alpha) + v2[2] * alpha
-
-                        glVertex3f(vx, vy, vz)
-                elif is_mdl7:
-                    # MDL7 format: (xyz0, xyz1, xyz2, uv0, uv1, uv2)
-                    vert_indices = tri[0:3]
-                    uv_indices = tri[3:6]
-
-                    for i in range(3):
-                        v_idx = vert_indices[i]
-                        uv_idx = uv_indices[i]
-
-                        # Texture coords from skinverts - already normalized floats
-                        st = self.mdl.skinverts[uv_idx]
-                        u = st[0]
-                        v = st[1]
-
-                        glTexCoord2f(u, v)
-
-                        # Vertex Interpolation
-                        v1 = verts1[v_idx]
-                        v2 = verts2[v_idx]
-
-                        vx = v1[0] * (1 - alpha) + v2[0] * alpha
-                        vy = v1[1] * (1 - alpha) + v2[1] * alpha
-                        vz = v1[2] * (1 - alpha) + v2[2] * alpha
-
-                        glVertex3f(vx, vy, vz)
-                else:
-                    # MDL3/4/5 format: (xyz0, xyz1, xyz2, uv0, uv1, uv2)
-                    vert_indices = tri[0:3]
-                    uv_indices = tri[3:6]
-
-                    for i in range(3):
-                        v_idx = vert_indices[i]
-                        uv_idx = uv_indices[i]
-
-                        # Texture coords from skinverts
-                        st = self.mdl.skinverts[uv_idx]
-                        s = st[0]
-                        t = st[1]
-
-                        u = s / skin_width
-                        v = t / skin_height
-
-                        glTexCoord2f(u, v)
-
-                        # Vertex Interpolation
-                        v1 = verts1[v_idx]
-                        v2 = verts2[v_idx]
-
-                        vx = v1[0] * (1 - alpha) + v2[0] * alpha
-                        vy = v1[1] * (1 - alpha) + v2[1] * alpha
-                        vz = v1[2] * (1 - alpha) + v2[2] * alpha
-
-                        glVertex3f(vx, vy, vz)
-
-        glEnd()
+            # Blend straight into the xyz columns of the interleaved array
+            positions = model_verts[:, :3]
+            np.multiply(self.frame_positions[frame_idx_1], 1.0 - alpha, out=positions)
+            positions += self.frame_positions[frame_idx_2] * alpha
+
+            # One 20-byte xyz+uv stream; texcoords start 12 bytes into each vertex
+            base = model_verts.ctypes.data
+            glEnableClientState(GL_VERTEX_ARRAY)
+            glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            glVertexPointer(3, GL_FLOAT, 20, ctypes.c_void_p(base))
+            glTexCoordPointer(2, GL_FLOAT, 20, ctypes.c_void_p(base + 12))
+            glDrawArrays(GL_TRIANGLES, 0, len(model_verts))
+            glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+            glDisableClientState(GL_VERTEX_ARRAY)
 
         # Draw text overlay
         self.draw_overlay()
@@ -453,6 +389,6 @@ class MDLViewer:
 
 
 if __name__ == "__main__":
-    folder = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
-    viewer = MDLViewer(folder)
+    folder, vsync = parse_viewer_args(sys.argv[1:])
+    viewer = MDLViewer(folder, vsync)
     viewer.run()
@@ -0,0 +1,122 @@
+"""
+Pixel format unpackers for MDL skins and WMB textures.
+Uses compiled numba kernels when numba is installed, numpy otherwise.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def _rgb565_numpy(pixels, out):
+    # 5/6-bit channels widened to 8 bits by replicating their high bits into the
+    # low ones ((x << 3) | (x >> 2)); shifts and ORs only, no integer divides
+    r = (pixels >> 11).astype(np.uint8)
+    np.left_shift(r, 3, out=out[:, 0])
+    r >>= 2
+    out[:, 0] |= r
+    g = ((pixels >> 5) & 0x3F).astype(np.uint8)
+    np.left_shift(g, 2, out=out[:, 1])
+    g >>= 4
+    out[:, 1] |= g
+    b = (pixels & 0x1F).astype(np.uint8)
+    np.left_shift(b, 3, out=out[:, 2])
+    b >>= 2
+    out[:, 2] |= b
+
+
+def _rgba4444_numpy(pixels, out):
+    # ARGB4444 nibbles scaled to 0..255 (n * 255 // 15 == n * 17)
+    for channel, shift in enumerate((8, 4, 0, 12)):
+        v = pixels >> shift
+        v &= 0xF
+        v *= 17
+        out[:, channel] = v
+
+
+def _palette8_numpy(src, out):
+    # No palette available, spread the index over the channels for visibility
+    out[:, 0] = src
+    np.multiply(src, 2, out=out[:, 1])
+    np.multiply(src, 3, out=out[:, 2])
+
+
+# Kernels release the GIL so the texture decode thread pool scales across cores
+if njit is not None:
+    @njit(nogil=True, cache=True)
+    def _rgb565_numba(pixels, out):
+        for i in range(pixels.shape[0]):
+            p = np.int32(pixels[i])
+            r = p >> 11
+            g = (p >> 5) & 0x3F
+            b = p & 0x1F
+            out[i, 0] = (r << 3) | (r >> 2)
+            out[i, 1] = (g << 2) | (g >> 4)
+            out[i, 2] = (b << 3) | (b >> 2)
+
+    @njit(nogil=True, cache=True)
+    def _rgba4444_numba(pixels, out):
+        for i in range(pixels.shape[0]):
+            p = np.int32(pixels[i])
+            out[i, 0] = ((p >> 8) & 0xF) * 17
+            out[i, 1] = ((p >> 4) & 0xF) * 17
+            out[i, 2] = (p & 0xF) * 17
+            out[i, 3] = (p >> 12) * 17
+
+    @njit(nogil=True, cache=True)
+    def _palette8_numba(src, out):
+        for i in range(src.shape[0]):
+            v = np.int32(src[i])
+            out[i, 0] = v
+            out[i, 1] = (v * 2) & 0xFF
+            out[i, 2] = (v * 3) & 0xFF
+
+    _rgb565 = _rgb565_numba
+    _rgba4444 = _rgba4444_numba
+    _palette8 = _palette8_numba
+else:
+    _rgb565 = _rgb565_numpy
+    _rgba4444 = _rgba4444_numpy
+    _palette8 = _palette8_numpy
+
+
+def _output(out, shape):
+    # Caller-provided (e.g. ScratchBuffer) uint8 storage viewed as shape, or a fresh array
+    if out is None:
+        return np.empty(shape, dtype=np.uint8)
+    return out.reshape(shape)
+
+
+def rgb565_to_rgb(buf, width, height, out=None):
+    """Expand a little-endian RGB565 payload to a (height, width, 3) uint8 RGB array, optionally into out"""
+    pixels = np.frombuffer(buf, dtype='<u2', count=width * height)
+    out = _output(out, (height, width, 3))
+    _rgb565(pixels, out.reshape(-1, 3))
+    return out
+
+
+def rgba4444_to_rgba(buf, width, height, out=None):
+    """Expand a little-endian ARGB4444 payload to a (height, width, 4) uint8 RGBA array, optionally into out"""
+    pixels = np.frombuffer(buf, dtype='<u2', count=width * height)
+    out = _output(out, (height, width, 4))
+    _rgba4444(pixels, out.reshape(-1, 4))
+    return out
+
+
+def palette8_to_rgb(buf, out=None):
+    """Map an 8-bit indexed payload to an (n, 3) uint8 false-color RGB array, optionally into out"""
+    src = np.frombuffer(buf, dtype=np.uint8)
+    out = _output(out, (len(src), 3))
+    _palette8(src, out)
+    return out
+
+
+# Compile (or load from numba's disk cache) each kernel for the read-only
+# buffer inputs the loaders pass, so the first texture decode doesn't stall on it
+if njit is not None:
+    rgb565_to_rgb(bytes(2), 1, 1)
+    rgba4444_to_rgba(bytes(2), 1, 1)
+    palette8_to_rgb(bytes(1))
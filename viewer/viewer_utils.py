@@ -1,12 +1,819 @@
 """
 Common utilities for MDL and WMB viewers.
-Provides text rendering, file list overlay, and file navigation.
+Provides text rendering, file list overlay, file navigation, WMB texture decoding
+and WMB6 geometry batching.
 """
 
 import pygame
 from OpenGL.GL import *
+from OpenGL.GL.EXT.texture_compression_s3tc import GL_COMPRESSED_RGB_S3TC_DXT1_EXT, GL_COMPRESSED_RGBA_S3TC_DXT5_EXT
+from OpenGL.extensions import hasGLExtension
+import numpy as np
+import ctypes
+import hashlib
+import math
 import os
-import glob
+import re
+import sys
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from tex_unpack import rgb565_to_rgb, palette8_to_rgb
+from cache_paths import CACHE_ROOT
+
+
+# Translation table deleting the non-printable Latin-1 chars (controls, NUL, etc.)
+_NON_PRINTABLE = str.maketrans('', '', ''.join(chr(c) for c in range(256) if not chr(c).isprintable()))
+
+
+def delete_textures(tex_ids):
+    """Delete GL textures in a single call, skipping None entries"""
+    ids = np.fromiter((t for t in tex_ids if t is not None), dtype=np.uint32)
+    if len(ids):
+        glDeleteTextures(ids)
+
+
+class ScratchBuffer:
+    """
+    Grow-only uint8 arena reused across loads, so unpacking a batch of textures
+    costs at most one allocation instead of one per texture.
+    Views handed out stay valid until the next get().
+    """
+
+    def __init__(self):
+        self.buf = np.empty(0, dtype=np.uint8)
+
+    def get(self, nbytes):
+        """Return an nbytes long uint8 view, growing the arena if needed"""
+        if self.buf.nbytes < nbytes:
+            self.buf = np.empty(nbytes, dtype=np.uint8)
+        return self.buf[:nbytes]
+
+
+class TexturePool:
+    """
+    Keeps GL texture names alive across file switches. Released textures are
+    handed out again, preferring one whose storage already has the requested
+    size and format so it can be refilled with glTexSubImage2D.
+    """
+
+    def __init__(self):
+        self.free = {}     # (width, height, internal_fmt) -> [tex_id, ...]
+        self.storage = {}  # tex_id -> (width, height, internal_fmt)
+
+    def acquire(self, width, height, internal_fmt):
+        """Return (tex_id, has_storage) for a texture about to hold an image of this size"""
+        key = (width, height, internal_fmt)
+        matching = self.free.get(key)
+        if matching:
+            return matching.pop(), True
+
+        # Any free name will do, its storage gets reallocated by glTexImage2D
+        for ids in self.free.values():
+            if ids:
+                tex_id = ids.pop()
+                break
+        else:
+            tex_id = int(glGenTextures(1))
+        self.storage[tex_id] = key
+        return tex_id, False
+
+    def release(self, tex_ids):
+        """Return textures to the pool, skipping None entries"""
+        for tex_id in tex_ids:
+            if tex_id is not None:
+                self.free.setdefault(self.storage[tex_id], []).append(tex_id)
+
+    def delete_all(self):
+        """Delete every texture the pool handed out"""
+        delete_textures(self.storage)
+        self.free = {}
+        self.storage = {}
+
+
+def _texinfo_tables(wmb):
+    """S/T planes (xyz + offset) and texture index per texinfo, plus a trailing default row"""
+    planes = wmb.texinfo_planes
+    s_table = np.concatenate([planes[:, 0], [(1, 0, 0, 0)]]).astype(np.float64)
+    t_table = np.concatenate([planes[:, 1], [(0, 1, 0, 0)]]).astype(np.float64)
+    tex_table = np.append(wmb.texinfo_texture, 0).astype(np.int64)
+    return s_table, t_table, tex_table
+
+
+def _texture_sizes(wmb):
+    """(width, height) per texture, plus a trailing 64x64 default row"""
+    return np.array([(tex['width'], tex['height']) for tex in wmb.textures] + [(64, 64)], dtype=np.float64)
+
+
+def triangulate_wmb6(wmb):
+    """
+    Fan-triangulate the WMB4/WMB6 faces. Returns the vertex table, per-corner
+    indices into it (3 per triangle) plus the per-triangle texinfo index.
+    """
+    starts = wmb.face_vert_starts.astype(np.int64)
+    lengths = np.diff(starts)
+    if len(lengths) and (lengths == 3).all():
+        # Already triangulated: the face corners are one contiguous run, no fan needed
+        tri_face = np.arange(len(lengths))
+        vert_idx = wmb.face_vert_indices[starts[0]:starts[-1]].astype(np.int64)
+    else:
+        tri_counts = np.maximum(lengths - 2, 0)
+        tri_face = np.repeat(np.arange(len(lengths)), tri_counts)
+
+        # k-th triangle of a face uses its corners 0, k+1, k+2
+        tri_k = np.arange(len(tri_face)) - np.repeat(np.cumsum(tri_counts) - tri_counts, tri_counts)
+        first = starts[tri_face]
+        corners = np.stack([first, first + tri_k + 1, first + tri_k + 2], axis=1).ravel()
+        vert_idx = wmb.face_vert_indices[corners].astype(np.int64)
+
+    # Corners share the file's vertex table; well-formed maps use it as-is
+    vertices = wmb.vertices
+    if len(vert_idx) and vert_idx.max() >= len(vertices):
+        # Out of range vertices collapse onto an extra origin row
+        vert_idx = np.minimum(vert_idx, len(vertices))
+        vertices = np.concatenate([vertices, np.zeros((1, 3), dtype=np.float32)])
+
+    # Out of range texinfo indices map to the default row; texture and flags are
+    # per texinfo/face and looked up by the batch builder, not copied per triangle
+    tri_info = np.minimum(wmb.face_tex_idx[tri_face], len(wmb.texinfo_texture)).astype(np.int64)
+
+    return {
+        'vertices': vertices,
+        'indices': vert_idx.astype(np.uint32),
+        'texinfo': tri_info
+    }
+
+
+# WMB6 batches are split over a CULL_GRID x CULL_GRID grid of the level's XY extent,
+# so each covers part of the map and the per-frame frustum test can skip it
+CULL_GRID = 8
+
+
+def _grid_cells(vertices, indices, grid):
+    """Cell of each triangle's XY centroid on a grid x grid split of their extent"""
+    centers = vertices[indices.reshape(-1, 3), :2].mean(axis=1)
+    lo = centers.min(axis=0)
+    span = np.maximum(centers.max(axis=0) - lo, 1e-6)
+    xy = np.minimum((centers - lo) / span * grid, grid - 1).astype(np.int64)
+    return xy[:, 0] * grid + xy[:, 1]
+
+
+def build_wmb6_batches(wmb, triangles):
+    """
+    Group triangulated faces into index batches per texinfo and grid cell, ordered
+    by first use of their texture. Each batch carries its Quake-style S/T planes,
+    normalized by the texture size, for GL_OBJECT_LINEAR texture coordinate generation.
+    """
+    tri_info = triangles['texinfo']
+    if not len(tri_info):
+        return []
+
+    s_table, t_table, tex_table = _texinfo_tables(wmb)
+
+    # Texinfos with the same planes and texture draw identically; map each to the
+    # first of its kind so they share one batch (and one draw call) per cell
+    rows = np.column_stack([s_table, t_table, tex_table])
+    _, first_of_kind, kind = np.unique(rows, axis=0, return_index=True, return_inverse=True)
+    tri_info = first_of_kind[kind.ravel()][tri_info]
+
+    num_cells = CULL_GRID * CULL_GRID
+    keys = tri_info * num_cells + _grid_cells(triangles['vertices'], triangles['indices'], CULL_GRID)
+    order = np.argsort(keys, kind='stable')
+    group_keys, counts = np.unique(keys, return_counts=True)
+    group_starts = np.cumsum(counts) - counts
+    infos = group_keys // num_cells
+    cells = (group_keys % num_cells).tolist()
+
+    # Keep the batches of one texture together, in first-use order, then by texinfo and cell
+    used_infos, used_first = np.unique(tri_info, return_index=True)
+    info_first = dict(zip(used_infos.tolist(), used_first.tolist()))
+    tex_first = {}
+    for info in sorted(info_first, key=info_first.get):
+        tex_first.setdefault(int(tex_table[info]), info_first[info])
+    group_tex = tex_table[infos].tolist()
+    group_first = [info_first[info] for info in infos.tolist()]
+    group_order = sorted(range(len(group_keys)), key=lambda g: (tex_first[group_tex[g]], group_first[g], cells[g]))
+
+    # Planes of every group divided by its texture size in one go; unknown textures count as 64x64
+    sizes = _texture_sizes(wmb)[np.minimum(tex_table[infos], len(wmb.textures))]
+    s_planes = (s_table[infos] / sizes[:, :1]).tolist()
+    t_planes = (t_table[infos] / sizes[:, 1:]).tolist()
+
+    batches = []
+    for g in group_order:
+        tris = order[group_starts[g]:group_starts[g] + counts[g]]
+        corners = (tris[:, None] * 3 + np.arange(3)).ravel()
+
+        batches.append({
+            'texture_idx': group_tex[g],
+            's_plane': s_planes[g],
+            't_plane': t_planes[g],
+            'indices': triangles['indices'][corners],
+            'vertex_count': len(corners)
+        })
+
+    return batches
+
+
+def build_wmb7_batches(wmb):
+    """
+    Gather the vertices of all WMB7 blocks into one shared xyz + uv table and
+    their triangles into one index batch per (texture, sky) material and block,
+    materials in first-use order. Each batch records its block so it can be
+    culled with the block's bounds. Returns (vertices, batches).
+    """
+    vertices = np.empty((sum(len(block['vertices']) for block in wmb.blocks), 5), dtype=np.float32)
+    groups = {}  # material -> {block index: (index runs, vertex base)}
+    base = 0
+    for block_idx, block in enumerate(wmb.blocks):
+        block_verts = block['vertices']
+        triangles = block['triangles']
+        skins = block['skins']
+        vertices[base:base + len(block_verts), :3] = block_verts['pos']
+        vertices[base:base + len(block_verts), 3:] = block_verts['uv']
+        if not len(triangles):
+            base += len(block_verts)
+            continue
+
+        # One stable sort puts each skin's triangles in a contiguous run, in file order
+        tri_skins = triangles['skin']
+        order = np.argsort(tri_skins, kind='stable')
+        sorted_indices = triangles['indices'][order]
+        unique_skins, first, counts = np.unique(tri_skins, return_index=True, return_counts=True)
+        run_starts = (np.cumsum(counts) - counts).tolist()
+        counts = counts.tolist()
+        unique_skins = unique_skins.tolist()
+        for g in np.argsort(first).tolist():
+            skin_idx = unique_skins[g]
+            if skin_idx < 0 or skin_idx >= len(skins):
+                continue
+
+            skin = skins[skin_idx]
+            key = (int(skin['texture']), (int(skin['flags']) & 2) != 0)
+
+            # Out-of-range indices are dropped per vertex; a trailing partial
+            # triangle is cut so it can't shift the rest of the batch
+            indices = sorted_indices[run_starts[g]:run_starts[g] + counts[g]].ravel()
+            indices = indices[(indices >= 0) & (indices < len(block_verts))]
+            indices = indices[:len(indices) - len(indices) % 3]
+            if len(indices):
+                groups.setdefault(key, {}).setdefault(block_idx, ([], base))[0].append(indices)
+        base += len(block_verts)
+
+    # Second pass: each block's runs of a material are rebased into one uint32 array
+    batches = []
+    for (tex_idx, is_sky), blocks in groups.items():
+        for block_idx, (parts, part_base) in blocks.items():
+            indices = np.concatenate(parts) if len(parts) > 1 else parts[0]
+            indices = np.add(indices, np.uint32(part_base), dtype=np.uint32, casting='unsafe')
+            batches.append({
+                'texture_idx': tex_idx,
+                'sky': is_sky,
+                'block': block_idx,
+                'indices': indices,
+                'vertex_count': len(indices)
+            })
+
+    return vertices, batches
+
+
+# Built world batches are cached next to the parse cache, keyed by the file's path,
+# size and mtime plus the loader's cache version. Bump BATCH_CACHE_VERSION whenever
+# the batch layout changes.
+BATCH_CACHE_VERSION = 2
+BATCH_CACHE_DIR = os.path.join(CACHE_ROOT, 'batches')
+
+
+def build_world_batches(wmb):
+    """Build (vertices, batches) for any WMB version"""
+    if wmb.version in (b'WMB4', b'WMB6'):
+        triangles = triangulate_wmb6(wmb)
+        print(f"Triangulated {wmb.num_faces} faces into {len(triangles['texinfo'])} triangles")
+        return triangles['vertices'], build_wmb6_batches(wmb, triangles)
+    return build_wmb7_batches(wmb)
+
+
+def cached_world_batches(wmb, filename):
+    """
+    build_world_batches(wmb) for the file it was loaded from, reusing the result
+    saved by an earlier load while the file's size and mtime are unchanged.
+    """
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return build_world_batches(wmb)
+    source = f"{os.path.abspath(filename)}:{st.st_size}:{st.st_mtime_ns}:{wmb.cache_version}"
+    key = hashlib.blake2b(source.encode(), digest_size=8).hexdigest()
+    path = os.path.join(BATCH_CACHE_DIR, f"{os.path.basename(filename)}.{key}.v{BATCH_CACHE_VERSION}.npz")
+
+    try:
+        with np.load(path) as data:
+            return _unpack_batches(data)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Ignoring batch cache {path}: {e}")
+
+    vertices, batches = build_world_batches(wmb)
+    _save_batches(path, vertices, batches)
+    return vertices, batches
+
+
+def _save_batches(path, vertices, batches):
+    """Store the batches column-wise: one array per key, indices back to back"""
+    arrays = {'vertices': vertices}
+    if batches:
+        arrays['indices'] = np.concatenate([batch['indices'] for batch in batches])
+        for name in batches[0]:
+            if name != 'indices':
+                arrays['batch_' + name] = np.array([batch[name] for batch in batches])
+    # Builds run on worker threads and the same file can be built twice at once,
+    # so every writer gets its own temp file
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write batch cache {path}: {e}")
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _unpack_batches(data):
+    """Inverse of _save_batches"""
+    columns = {name[len('batch_'):]: data[name] for name in data.files if name.startswith('batch_')}
+    if not columns:
+        return data['vertices'], []
+    counts = columns['vertex_count']
+    batches = [{name: column[i].tolist() if column.ndim == 1 else column[i] for name, column in columns.items()}
+               for i in range(len(counts))]
+    for batch, indices in zip(batches, np.split(data['indices'], np.cumsum(counts)[:-1])):
+        batch['indices'] = indices
+    return data['vertices'], batches
+
+
+def sort_batches_by_texture(batches, texture_ids):
+    """
+    Resolve each batch's GL texture (None when the texture is missing or failed
+    to load) into batch['gl_tex'] and move the untextured batches after the
+    textured ones, so texturing is switched off at most once per frame.
+    """
+    for batch in batches:
+        tex_idx = batch['texture_idx']
+        batch['gl_tex'] = texture_ids[tex_idx] if 0 <= tex_idx < len(texture_ids) else None
+    # Stable, so textured batches keep their texture runs
+    return sorted(batches, key=lambda batch: batch['gl_tex'] is None)
+
+
+# Interleaved layout of the WMB7 world vertex table: xyz + uv as float32
+# (WMB6 generates its texcoords, so its table holds tightly packed xyz only)
+BATCH_STRIDE = 5 * 4
+BATCH_UV_OFFSET = ctypes.c_void_p(3 * 4)
+
+
+def upload_render_batches(vertices, batches):
+    """
+    Upload the shared vertex table into a static VBO and the batches' indices, back
+    to back, into a static index buffer, recording each batch's first index.
+    Returns (vbo, ibo), or (None, None) if there is nothing to draw.
+    """
+    total = sum(batch['vertex_count'] for batch in batches)
+    if not total:
+        return None, None
+
+    indices = np.empty(total, dtype=np.uint32)
+    first = 0
+    for batch in batches:
+        count = batch['vertex_count']
+        indices[first:first + count] = batch.pop('indices')
+        batch['first'] = first
+        first += count
+
+    vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+    vbo, ibo = (int(buf) for buf in glGenBuffers(2))
+    glBindBuffer(GL_ARRAY_BUFFER, vbo)
+    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ibo)
+    glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    return vbo, ibo
+
+
+# Bytes per pixel of the transfer formats the viewers upload
+_PIXEL_SIZES = {GL_RGB: 3, GL_BGR: 3, GL_RGBA: 4, GL_BGRA: 4}
+
+
+@lru_cache(maxsize=1)
+def _has_s3tc():
+    return hasGLExtension('GL_EXT_texture_compression_s3tc')
+
+
+# Below this edge length the block padding and compression work outweigh the savings
+COMPRESS_MIN_SIZE = 32
+
+
+def compressed_format(fmt, width, height):
+    """
+    Internal format that has the driver compress fmt pixels on upload:
+    DXT1/DXT5 when S3TC is available, otherwise the generic compressed formats.
+    Textures smaller than COMPRESS_MIN_SIZE on either side stay uncompressed.
+    """
+    has_alpha = fmt in (GL_RGBA, GL_BGRA)
+    if width < COMPRESS_MIN_SIZE or height < COMPRESS_MIN_SIZE:
+        return GL_RGBA if has_alpha else GL_RGB
+    if _has_s3tc():
+        return GL_COMPRESSED_RGBA_S3TC_DXT5_EXT if has_alpha else GL_COMPRESSED_RGB_S3TC_DXT1_EXT
+    return GL_COMPRESSED_RGBA if has_alpha else GL_COMPRESSED_RGB
+
+
+class PixelUploader:
+    """
+    Streams glTexImage2D uploads through two round-robin pixel unpack buffers,
+    so the driver copies from a PBO instead of blocking on client memory.
+    Use as a context manager around a batch of uploads.
+    """
+
+    def __init__(self):
+        self.pbos = []
+        self.next = 0
+
+    def __enter__(self):
+        self.pbos = list(glGenBuffers(2))
+        return self
+
+    def __exit__(self, *exc):
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        glDeleteBuffers(len(self.pbos), self.pbos)
+        self.pbos = []
+
+    def tex_image_2d(self, internal_fmt, width, height, fmt, pixels, has_storage=False):
+        """
+        Upload level 0 of the bound GL_TEXTURE_2D from pixels (any buffer).
+        With has_storage the existing level 0 (same size/format) is overwritten in place.
+        """
+        src = np.frombuffer(pixels, dtype=np.uint8)
+        # Rows are padded to GL_UNPACK_ALIGNMENT (4)
+        row_bytes = (width * _PIXEL_SIZES[fmt] + 3) & ~3
+        nbytes = row_bytes * height
+
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, self.pbos[self.next])
+        self.next ^= 1
+        # Orphan the previous storage so this doesn't wait on an upload in flight
+        glBufferData(GL_PIXEL_UNPACK_BUFFER, nbytes, None, GL_STREAM_DRAW)
+        ptr = glMapBuffer(GL_PIXEL_UNPACK_BUFFER, GL_WRITE_ONLY)
+        ctypes.memmove(ptr, src.ctypes.data, min(nbytes, src.nbytes))
+        glUnmapBuffer(GL_PIXEL_UNPACK_BUFFER)
+        if has_storage:
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, width, height, fmt, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        else:
+            glTexImage2D(GL_TEXTURE_2D, 0, internal_fmt, width, height, 0, fmt, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+
+
+class BatchListCache:
+    """
+    Records the GL commands of a static batched draw function into display lists,
+    one set per state key, and replays only the visible batches with a single
+    glCallLists.
+
+    The draw function is called with the cache and marks its command stream:
+    setup() before the shared state setup, state(binds) before a texture state
+    change the following batches rely on, batch(triangles) before each batch's
+    own commands and teardown() before restoring the state.
+    """
+
+    def __init__(self):
+        self.sets = {}  # key -> compiled list set (see _finish)
+        self._building = None
+
+    def _begin(self):
+        """End the list being recorded and start a new one"""
+        building = self._building
+        if building['open']:
+            glEndList()
+        display_list = int(glGenLists(1))
+        glNewList(display_list, GL_COMPILE)
+        building['open'] = True
+        building['lists'].append(display_list)
+        return display_list
+
+    def setup(self):
+        self._building['setup'] = self._begin()
+
+    def state(self, binds):
+        self._building['groups'].append((self._begin(), binds))
+
+    def batch(self, triangles):
+        building = self._building
+        building['batches'].append((self._begin(), len(building['groups']) - 1, triangles))
+
+    def teardown(self):
+        self._building['teardown'] = self._begin()
+
+    def _finish(self):
+        building = self._building
+        self._building = None
+        if building['open']:
+            glEndList()
+        batches = building['batches']
+        groups = building['groups']
+        return {
+            'lists': building['lists'],
+            'setup': building['setup'],
+            'teardown': building['teardown'],
+            'batch_lists': np.array([b[0] for b in batches], dtype=np.uint32),
+            'batch_groups': np.array([b[1] for b in batches], dtype=np.int64),
+            'batch_triangles': np.array([b[2] for b in batches], dtype=np.int64),
+            'group_lists': np.array([g[0] for g in groups], dtype=np.uint32),
+            'group_binds': np.array([g[1] for g in groups], dtype=np.int64),
+        }
+
+    def call(self, key, draw, visible):
+        """
+        Replay the batches selected by the visible mask from the set for key,
+        compiling it from draw(self) on first use.
+        Returns the replayed texture_binds, triangles and draw_calls.
+        """
+        entry = self.sets.get(key)
+        if entry is None:
+            self._building = {'open': False, 'lists': [], 'setup': None, 'teardown': None,
+                              'groups': [], 'batches': []}
+            draw(self)
+            entry = self.sets[key] = self._finish()
+
+        # A still camera sees the same batches; replay the id list built for them last time
+        last = entry.get('last')
+        if last is not None and np.array_equal(last[0], visible):
+            ids, counts = last[1], last[2]
+            glCallLists(len(ids), GL_UNSIGNED_INT, ids)
+            return counts
+
+        shown = np.flatnonzero(visible)
+        groups = entry['batch_groups'][shown]
+        # A batch needs its group's state list unless the previous shown batch already set it
+        starts = np.ones(len(shown), dtype=bool)
+        starts[1:] = groups[1:] != groups[:-1]
+        starts &= groups >= 0
+        entered = groups[starts]
+
+        ids = np.insert(entry['batch_lists'][shown], np.flatnonzero(starts), entry['group_lists'][entered])
+        ids = np.concatenate(([entry['setup']], ids, [entry['teardown']])).astype(np.uint32)
+        glCallLists(len(ids), GL_UNSIGNED_INT, ids)
+
+        counts = {
+            'texture_binds': int(entry['group_binds'][entered].sum()),
+            'triangles': int(entry['batch_triangles'][shown].sum()),
+            'draw_calls': len(shown),
+        }
+        entry['last'] = (np.array(visible, dtype=bool), ids, counts)
+        return counts
+
+    def clear(self):
+        """Delete all lists, e.g. when the geometry or its textures change"""
+        for entry in self.sets.values():
+            for display_list in entry['lists']:
+                glDeleteLists(display_list, 1)
+        self.sets = {}
+
+
+def batch_bounds(vertices, batches):
+    """Axis-aligned bounds of each batch's indexed vertices, as (mins, maxs) arrays of shape (n, 3)"""
+    mins = np.zeros((len(batches), 3), dtype=np.float32)
+    maxs = np.zeros((len(batches), 3), dtype=np.float32)
+    for i, batch in enumerate(batches):
+        if len(batch['indices']):
+            corners = vertices[batch['indices'], :3]
+            mins[i] = corners.min(axis=0)
+            maxs[i] = corners.max(axis=0)
+    return mins, maxs
+
+
+def world_batch_bounds(wmb, vertices, batches):
+    """Culling boxes of the world batches: WMB7 batches use their block's box from the file"""
+    if wmb.version in (b'WMB4', b'WMB6'):
+        return batch_bounds(vertices, batches)
+    boxes = wmb.block_bounds[[batch['block'] for batch in batches]]
+    return boxes[:, 0], boxes[:, 1]
+
+
+def frustum_visible(mins, maxs, view_projection):
+    """
+    Mask of the axis-aligned boxes (rows of mins/maxs) that intersect the view
+    frustum of view_projection, column-major as GL stores it (view @ projection).
+    """
+    clip = view_projection
+    # Gribb-Hartmann: the planes are row 3 +/- rows 0..2 of projection @ view,
+    # here one plane (a, b, c, d) per column
+    planes = np.concatenate([clip[:, 3:] + clip[:, :3], clip[:, 3:] - clip[:, :3]], axis=1)
+    normals = planes[:3]
+    # Signed distance of each box's corner furthest along each plane normal
+    dist = maxs @ np.maximum(normals, 0) + mins @ np.minimum(normals, 0) + planes[3]
+    return (dist >= 0).all(axis=1)
+
+
+def _unpacked_size(tex, data):
+    """Bytes of RGB output decode_wmb_texture writes for this payload (0 when it is passed through)"""
+    if data is None:
+        return 0
+    if tex['format'] == 'rgb565':
+        return tex['width'] * tex['height'] * 3
+    if tex['format'] == 'palette8':
+        return len(data) * 3
+    return 0
+
+
+def decode_wmb_texture(tex, data, out=None):
+    """
+    Convert a WMB texture payload to (pixel data, GL format), or None if unsupported.
+    Unpacked formats are written into out (uint8, _unpacked_size bytes) when given.
+    """
+    if data is None or tex['format'] == 'unknown' or tex['format'] == 'dds':
+        return None
+
+    if tex['format'] == 'rgb565':
+        return rgb565_to_rgb(data, tex['width'], tex['height'], out), GL_RGB
+
+    # Stored BGR(A); uploaded as-is and swizzled by the driver
+    elif tex['format'] == 'rgba8888':
+        return np.frombuffer(data, dtype=np.uint8), GL_BGRA
+
+    elif tex['format'] == 'rgb888':
+        return np.frombuffer(data, dtype=np.uint8), GL_BGR
+
+    elif tex['format'] == 'palette8':
+        # For 8-bit, create a simple colorful mapping for visibility
+        return palette8_to_rgb(data, out), GL_RGB
+
+    return None
+
+
+def decode_wmb_textures(wmb, scratch=None):
+    """
+    Decode all textures of a loaded WMB, spread over a thread pool.
+    The per-pixel work (numpy or nogil numba kernels) releases the GIL; GL upload stays on the caller's thread.
+    Unpacked textures are written to disjoint slices of scratch (a ScratchBuffer), when given,
+    so the results are only valid until its next use.
+    """
+    textures = wmb.textures
+    payloads = [wmb.get_texture_data(i) for i in range(len(textures))]
+
+    outs = [None] * len(textures)
+    if scratch is not None:
+        sizes = [_unpacked_size(tex, data) for tex, data in zip(textures, payloads)]
+        arena = scratch.get(sum(sizes))
+        offset = 0
+        for i, size in enumerate(sizes):
+            if size:
+                outs[i] = arena[offset:offset + size]
+                offset += size
+
+    if len(textures) < 2:
+        return [decode_wmb_texture(*args) for args in zip(textures, payloads, outs)]
+    with ThreadPoolExecutor(max_workers=min(len(textures), os.cpu_count() or 1)) as pool:
+        return list(pool.map(decode_wmb_texture, textures, payloads, outs))
+
+
+# Attribute groups the overlay touches: enables, blending, texture binding,
+# current color and polygon mode (wireframe)
+OVERLAY_ATTRIB_BITS = GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_TEXTURE_BIT | GL_CURRENT_BIT | GL_POLYGON_BIT
+
+
+class GLState:
+    """
+    Python-side cache of the GL toggles used by the overlay, so redundant
+    glEnable/glDisable/glBlendFunc calls are skipped.
+
+    The overlay saves state with glPushAttrib and calls reset() after the
+    matching glPopAttrib, since the pop restores whatever the viewer had set.
+    """
+    caps = {}
+    blend_func = None
+    # Set while drawing into the overlay FBO: alpha accumulates as coverage so
+    # the result is a premultiplied image that can be composited later
+    separate_alpha = False
+
+    @classmethod
+    def reset(cls):
+        cls.caps = {}
+        cls.blend_func = None
+
+    @classmethod
+    def enable(cls, cap):
+        if cls.caps.get(cap) is not True:
+            glEnable(cap)
+            cls.caps[cap] = True
+
+    @classmethod
+    def disable(cls, cap):
+        if cls.caps.get(cap) is not False:
+            glDisable(cap)
+            cls.caps[cap] = False
+
+    @classmethod
+    def set_blend_func(cls, src, dst):
+        if cls.blend_func != (src, dst):
+            if cls.separate_alpha:
+                glBlendFuncSeparate(src, dst, GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+            else:
+                glBlendFunc(src, dst)
+            cls.blend_func = (src, dst)
+
+
+class GlyphAtlas:
+    """Rasterizes the glyphs of one font once and packs them into a single alpha texture"""
+
+    def __init__(self, font, size=512):
+        self.font = font
+        self.size = size
+        # char -> (u0, v0, u1, v1, width, height, advance), None if it does not fit
+        self.glyphs = {}
+        self.tex_id = None
+        self._pixels = np.zeros((size, size), dtype=np.uint8)
+        # Shelf packer state
+        self._pen_x = 0
+        self._pen_y = 0
+        self._row_height = 0
+
+        # Printable ASCII up front, everything else on demand
+        for code in range(32, 127):
+            self._add(chr(code))
+
+    def _add(self, ch):
+        """Rasterize and pack one glyph into the CPU-side atlas"""
+        surface = self.font.render(ch, True, (255, 255, 255))
+        width, height = surface.get_size()
+        metrics = self.font.metrics(ch)
+        advance = metrics[0][4] if metrics and metrics[0] else width
+
+        # 1px gap between glyphs so linear filtering never picks up a neighbour
+        if self._pen_x + width + 1 > self.size:
+            self._pen_x = 0
+            self._pen_y += self._row_height + 1
+            self._row_height = 0
+        if self._pen_y + height > self.size or width + 1 > self.size:
+            print(f"Glyph atlas full, dropping {ch!r}")
+            self.glyphs[ch] = None
+            return None
+
+        x, y = self._pen_x, self._pen_y
+        if width > 0 and height > 0:
+            # Copy straight out of the surface's alpha plane (a zero-copy view);
+            # rows stay top-down, the texcoords account for GL's bottom-up V
+            alpha = pygame.surfarray.pixels_alpha(surface)
+            self._pixels[y:y + height, x:x + width] = alpha.T
+            del alpha
+        self._pen_x += width + 1
+        self._row_height = max(self._row_height, height)
+
+        glyph = (x / self.size, y / self.size, (x + width) / self.size, (y + height) / self.size,
+                 width, height, advance)
+        self.glyphs[ch] = glyph
+
+        # Glyphs added after the first upload only update their own sub-rectangle
+        if self.tex_id is not None and width > 0 and height > 0:
+            glPushAttrib(GL_TEXTURE_BIT)
+            glPushClientAttrib(GL_CLIENT_PIXEL_STORE_BIT)
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+            glBindTexture(GL_TEXTURE_2D, self.tex_id)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, x, y, width, height, GL_ALPHA, GL_UNSIGNED_BYTE,
+                            np.ascontiguousarray(self._pixels[y:y + height, x:x + width]))
+            glPopClientAttrib()
+            glPopAttrib()
+        return glyph
+
+    def glyph(self, ch):
+        """Get glyph info, rasterizing it if it has not been seen yet"""
+        if ch in self.glyphs:
+            return self.glyphs[ch]
+        return self._add(ch)
+
+    def texture(self):
+        """Get the GL texture, uploading the atlas on first use"""
+        if self.tex_id is None:
+            self.tex_id = glGenTextures(1)
+            glPushAttrib(GL_TEXTURE_BIT)
+            glPushClientAttrib(GL_CLIENT_PIXEL_STORE_BIT)
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+            glBindTexture(GL_TEXTURE_2D, self.tex_id)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_ALPHA, self.size, self.size, 0, GL_ALPHA, GL_UNSIGNED_BYTE, self._pixels)
+            glPopClientAttrib()
+            glPopAttrib()
+        return self.tex_id
+
+    def release(self):
+        """Delete the GL texture; it is re-uploaded from the CPU copy on next use"""
+        delete_textures((self.tex_id,))
+        self.tex_id = None
 
 
 class TextRenderer:
@@ -18,64 +825,328 @@ class TextRenderer:
         pygame.font.init()
         self.font = pygame.font.SysFont('Arial', 18)
         self.font_large = pygame.font.SysFont('Arial', 24)
+        self.atlas = GlyphAtlas(self.font)
+        self.atlas_large = GlyphAtlas(self.font_large)
 
-    def render(self, text, x, y, color=(255, 255, 255), large=False):
-        """Render text at screen position (x, y)"""
-        font = self.font_large if large else self.font
+        # LRU cache of string layouts: (text, large) -> (n*6, 4) float32 x, y, u, v
+        # relative to the text origin, or None for strings with nothing to draw
+        self._cache = OrderedDict()
+        self._cache_max = 128
+
+        # Column-major glOrtho(0, width, 0, height, -1, 1), loaded directly in begin_2d
+        self._ortho = np.array([
+            [2.0 / width, 0, 0, 0],
+            [0, 2.0 / height, 0, 0],
+            [0, 0, -1, 0],
+            [-1, -1, 0, 1],
+        ], dtype=np.float32)
+        self._depth_2d = 0
+
+        # Text batching: queued (layout, atlas, x, y, color) tuples and a reusable vertex buffer
+        self._batch = None
+        self._vbo = None
+        self._vbo_size = 0
+
+    def invalidate(self):
+        """Drop cached layouts and atlas textures (e.g. after a resize or context change)"""
+        self._cache.clear()
+        self.atlas.release()
+        self.atlas_large.release()
+
+    def _layout(self, text, large):
+        """Return glyph quads for a string, building them on a cache miss"""
+        key = (text, large)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        atlas = self.atlas_large if large else self.atlas
         # Sanitize text - remove null characters and non-printable chars
-        text = ''.join(c if c.isprintable() else '' for c in text)
-        if not text:
+        clean = text.translate(_NON_PRINTABLE)
+        if not clean.isprintable():
+            # Non-printable chars beyond Latin-1 are rare, take the slow path
+            clean = ''.join(c for c in clean if c.isprintable())
+        glyphs = [g for g in map(atlas.glyph, clean) if g is not None]
+
+        layout = None
+        if glyphs:
+            # Glyphs hang from a common top line, like a whole-string font.render
+            top = max(g[5] for g in glyphs)
+            layout = np.empty((len(glyphs) * 6, 4), dtype=np.float32)
+            pen = 0
+            for i, (u0, v0, u1, v1, width, height, advance) in enumerate(glyphs):
+                x0, x1 = pen, pen + width
+                y0, y1 = top - height, top
+                layout[i * 6:i * 6 + 6] = (
+                    (x0, y0, u0, v1), (x1, y0, u1, v1), (x1, y1, u1, v0),
+                    (x0, y0, u0, v1), (x1, y1, u1, v0), (x0, y1, u0, v0),
+                )
+                pen += advance
+
+        # Empty strings are cached too so they are not re-sanitized every frame
+        self._cache[key] = layout
+        if len(self._cache) > self._cache_max:
+            self._cache.popitem(last=False)
+        return layout
+
+    def begin_batch(self):
+        """Start collecting text quads; they are drawn together by end_batch()"""
+        self._batch = []
+
+    def queue(self, text, x, y, color=(255, 255, 255), large=False):
+        """Queue text for the current batch"""
+        layout = self._layout(text, large)
+        if layout is not None:
+            atlas = self.atlas_large if large else self.atlas
+            self._batch.append((layout, atlas, x, y, color))
+
+    def end_batch(self):
+        """Draw all queued text with one VBO upload and one draw call per atlas run"""
+        batch = self._batch
+        self._batch = None
+        if not batch:
             return
 
-        surface = font.render(text, True, color)
-        text_data = pygame.image.tostring(surface, "RGBA", True)
-        width, height = surface.get_size()
+        # x, y, u, v, r, g, b, a per vertex
+        count = sum(len(layout) for layout, _, _, _, _ in batch)
+        verts = np.empty((count, 8), dtype=np.float32)
+        runs = []
+        offset = 0
+        for layout, atlas, x, y, color in batch:
+            n = len(layout)
+            block = verts[offset:offset + n]
+            block[:, 0] = layout[:, 0] + x
+            block[:, 1] = layout[:, 1] + y
+            block[:, 2:4] = layout[:, 2:4]
+            block[:, 4:7] = np.asarray(color[:3], dtype=np.float32) / 255.0
+            block[:, 7] = color[3] / 255.0 if len(color) > 3 else 1.0
+            if runs and runs[-1][0] is atlas:
+                runs[-1][2] += n
+            else:
+                runs.append([atlas, offset, n])
+            offset += n
 
-        # Save OpenGL state
-        glPushAttrib(GL_ALL_ATTRIB_BITS)
-        glPushMatrix()
+        # No-op when the caller already entered 2D for the whole overlay
+        self.begin_2d()
+
+        GLState.enable(GL_BLEND)
+        GLState.set_blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        GLState.enable(GL_TEXTURE_2D)
+        glTexEnvi(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_MODULATE)
+
+        # Persistent VBO, only reallocated when a larger batch comes along
+        if self._vbo is None:
+            self._vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self._vbo)
+        if verts.nbytes > self._vbo_size:
+            glBufferData(GL_ARRAY_BUFFER, verts.nbytes, verts, GL_DYNAMIC_DRAW)
+            self._vbo_size = verts.nbytes
+        else:
+            glBufferSubData(GL_ARRAY_BUFFER, 0, verts.nbytes, verts)
+
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(2, GL_FLOAT, 32, ctypes.c_void_p(0))
+        glTexCoordPointer(2, GL_FLOAT, 32, ctypes.c_void_p(8))
+        glColorPointer(4, GL_FLOAT, 32, ctypes.c_void_p(16))
+
+        # Draw consecutive strings sharing an atlas together, in queue order
+        for atlas, first, n in runs:
+            glBindTexture(GL_TEXTURE_2D, atlas.texture())
+            glDrawArrays(GL_TRIANGLES, first, n)
+
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self.end_2d()
+
+    def begin_2d(self):
+        """
+        Save GL state and switch to a pixel-space ortho projection for overlay drawing.
+
+        Calls nest: everything between the outermost begin_2d() and end_2d()
+        shares one state save and one projection setup.
+        """
+        self._depth_2d += 1
+        if self._depth_2d > 1:
+            return
+
+        glPushAttrib(OVERLAY_ATTRIB_BITS)
+        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
 
-        # Switch to 2D
         glMatrixMode(GL_PROJECTION)
         glPushMatrix()
-        glLoadIdentity()
-        glOrtho(0, self.width, 0, self.height, -1, 1)
+        glLoadMatrixf(self._ortho)
         glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
         glLoadIdentity()
 
-        glDisable(GL_DEPTH_TEST)
-        glDisable(GL_CULL_FACE)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        glEnable(GL_TEXTURE_2D)
-
-        tex_id = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, tex_id)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, text_data)
+        GLState.disable(GL_DEPTH_TEST)
+        GLState.disable(GL_CULL_FACE)
+        # Overlay quads stay filled in wireframe mode
+        glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
 
-        # Draw quad
-        glBegin(GL_QUADS)
-        glTexCoord2f(0, 0); glVertex2f(x, y)
-        glTexCoord2f(1, 0); glVertex2f(x + width, y)
-        glTexCoord2f(1, 1); glVertex2f(x + width, y + height)
-        glTexCoord2f(0, 1); glVertex2f(x, y + height)
-        glEnd()
-
-        glDeleteTextures([tex_id])
+    def end_2d(self):
+        """Restore the projection and GL state saved by the outermost begin_2d()"""
+        self._depth_2d -= 1
+        if self._depth_2d > 0:
+            return
 
-        # Restore
         glMatrixMode(GL_PROJECTION)
         glPopMatrix()
         glMatrixMode(GL_MODELVIEW)
         glPopMatrix()
+        glPopClientAttrib()
         glPopAttrib()
+        GLState.reset()
+
+    def render(self, text, x, y, color=(255, 255, 255), large=False):
+        """Render text at screen position (x, y), or queue it if a batch is open"""
+        if self._batch is not None:
+            self.queue(text, x, y, color, large)
+            return
+        self.begin_batch()
+        self.queue(text, x, y, color, large)
+        self.end_batch()
+
+
+# Fly camera of the free-look viewers (Z up, angles in degrees)
+@lru_cache(maxsize=1)
+def camera_vectors(yaw, pitch):
+    """
+    Forward and right unit vectors of a Z-up fly camera (angles in degrees).
+    Cached so input handling and drawing share one evaluation per orientation.
+    """
+    yaw_rad = math.radians(yaw)
+    pitch_rad = math.radians(pitch)
+    sin_yaw, cos_yaw = math.sin(yaw_rad), math.cos(yaw_rad)
+    sin_pitch, cos_pitch = math.sin(pitch_rad), math.cos(pitch_rad)
+    forward = (cos_pitch * sin_yaw, cos_pitch * cos_yaw, sin_pitch)
+    right = (cos_yaw, -sin_yaw, 0)
+    return forward, right
+
+
+@lru_cache(maxsize=1)
+def _camera_rotation(yaw, pitch):
+    # Rows are gluLookAt's side, up and -forward axes for a Z-up camera
+    forward, right = camera_vectors(yaw, pitch)
+    up = np.cross(right, forward)
+    return np.array([right, up, np.negative(forward)], dtype=np.float64)
+
+
+def camera_view_matrix(pos, yaw, pitch):
+    """
+    View matrix of the fly camera, equal to gluLookAt(pos, pos + forward, Z up),
+    as a column-major (4, 4) float32 array for glLoadMatrixf and frustum_visible.
+    """
+    rotation = _camera_rotation(yaw, pitch)
+    view = np.identity(4, dtype=np.float32)
+    view[:3, :3] = rotation.T
+    view[3, :3] = -(rotation @ pos)
+    return view
+
+
+_DIGITS = re.compile(r'(\d+)')
+
+
+def natural_key(name):
+    """Sort key that orders embedded numbers numerically (mesh_2 before mesh_10)"""
+    return [int(part) if part.isdigit() else part.lower() for part in _DIGITS.split(name)]
+
+
+# Directory listings: (folder, extension) -> (mtime_ns, sorted paths)
+_dir_cache = {}
+
+
+def scan_folder(folder, extension):
+    """
+    List files in folder ending with extension, in natural sort order.
+
+    Uses a single os.scandir pass and reuses the previous result while the
+    directory's mtime is unchanged.
+    """
+    # Game files come in mixed case (CIUDAD.WMB), match the extension case-insensitively
+    extension = extension.lower()
+    try:
+        mtime = os.stat(folder).st_mtime_ns
+    except OSError:
+        return []
+
+    cached = _dir_cache.get((folder, extension))
+    if cached is not None and cached[0] == mtime:
+        return list(cached[1])
+
+    try:
+        with os.scandir(folder) as it:
+            # Like glob, skip hidden files
+            entries = [(entry.name, entry.path) for entry in it
+                       if entry.name.lower().endswith(extension) and not entry.name.startswith('.')]
+    except OSError:
+        return []
+
+    # Sort keys are computed once per name; the raw name breaks ties
+    entries.sort(key=lambda e: (natural_key(e[0]), e[0]))
+    files = [path for _, path in entries]
+
+    _dir_cache[(folder, extension)] = (mtime, files)
+    return list(files)
+
+
+def parse_viewer_args(argv):
+    """(folder, vsync) from a viewer's command line: [folder] [--vsync]"""
+    args = [arg for arg in argv if arg != '--vsync']
+    return (args[0] if args else os.getcwd()), '--vsync' in argv
+
+
+def _set_swap_interval(interval):
+    """Set the current context's swap interval through WGL/GLX; False if the extension is missing"""
+    try:
+        if sys.platform == 'win32':
+            from OpenGL.WGL.EXT.swap_control import wglSwapIntervalEXT
+            return bool(wglSwapIntervalEXT(interval))
+        from OpenGL.GLX.MESA.swap_control import glXSwapIntervalMESA
+        return glXSwapIntervalMESA(interval) == 0
+    except Exception:
+        # Unsupported platform binding or a null extension entry point
+        return False
+
+
+def open_gl_window(size, vsync=False):
+    """
+    Open the double-buffered GL window. Without vsync the swap interval is set
+    to 0, also directly on the context in case pygame left the driver default,
+    so flip() never waits for vblank and the viewers pace frames with clock.tick().
+    """
+    flags = pygame.DOUBLEBUF | pygame.OPENGL
+    try:
+        screen = pygame.display.set_mode(size, flags, vsync=int(vsync))
+    except pygame.error as e:
+        print(f"VSync unavailable, continuing without it: {e}")
+        screen = pygame.display.set_mode(size, flags)
+        vsync = False
+    if not vsync:
+        _set_swap_interval(0)
+    return screen
+
+
+# Event types the free-look viewers (and their FileNavigator) react to; mouse look
+# reads pygame.mouse.get_rel() instead of MOUSEMOTION events
+INPUT_EVENTS = (pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN)
 
 
 class FileNavigator:
     """Manages file list and navigation for viewers"""
 
+    # File list layout, in pygame (top-down) pixels
+    _LIST_WIDTH = 320
+    _LIST_ITEM_H = 22
+    _LIST_Y0 = 100          # first row, below the title at y=70
+    _LIST_VISIBLE = 20
+    _LIST_MAX_Y = _LIST_Y0 + _LIST_VISIBLE * _LIST_ITEM_H
+
     def __init__(self, folder, extension, width, height):
         """
         Initialize file navigator.
@@ -91,16 +1162,30 @@ class FileNavigator:
         self.width = width
         self.height = height
 
-        # Find all matching files
-        pattern = os.path.join(self.folder, f"*{extension}")
-        self.files = sorted(glob.glob(pattern))
+        # Every viewer picks its first file at startup, so scan right away
+        self.files = scan_folder(self.folder, self.extension)
+        # File names don't change during a session, so strip the paths once
+        self._basenames = [os.path.basename(f) for f in self.files]
 
         self.current_index = 0
         self.show_file_list = False
         self.list_scroll_offset = 0
+        # File list rows as (text, y, color), rebuilt when scroll or selection changes
+        self._display_cache = None
+        self._display_cache_key = None
+        # GL y of each visible row, top row first
+        y_start = self.height - self._LIST_Y0
+        self._row_y = tuple(y_start - i * self._LIST_ITEM_H for i in range(self._LIST_VISIBLE))
 
         self.text_renderer = TextRenderer(width, height)
 
+        # Overlay is rendered into an offscreen texture and only redrawn when
+        # its inputs change; False means FBOs are unavailable
+        self._overlay_key = None
+        self._overlay_fbo = None
+        self._overlay_tex = None
+        self._bg_list = None
+
     @property
     def current_file(self):
         """Get current file path"""
@@ -113,7 +1198,7 @@ class FileNavigator:
         """Get current file name (without path)"""
         if not self.files:
             return None
-        return os.path.basename(self.files[self.current_index])
+        return self._basenames[self.current_index]
 
     @property
     def file_count(self):
@@ -124,7 +1209,11 @@ class FileNavigator:
         """Switch to next/previous file. Returns True if changed."""
         if not self.files:
             return False
-        new_index = (self.current_index + delta) % len(self.files)
+        n = len(self.files)
+        new_index = self.current_index + delta
+        # Only wrap when stepping off either end
+        if new_index >= n or new_index < 0:
+            new_index %= n
         if new_index != self.current_index:
             self.current_index = new_index
             return True
@@ -159,12 +1248,12 @@ class FileNavigator:
                     return ('switch', self.current_index)
             elif event.key == pygame.K_l:
                 self.show_file_list = not self.show_file_list
-                self.list_scroll_offset = max(0, self.current_index - 10)
+                self.list_scroll_offset = max(0, self.current_index - self._LIST_VISIBLE // 2)
                 return ('toggle_list', self.show_file_list)
             elif event.key == pygame.K_UP and self.show_file_list:
                 self.list_scroll_offset = max(0, self.list_scroll_offset - 1)
             elif event.key == pygame.K_DOWN and self.show_file_list:
-                max_scroll = max(0, len(self.files) - 20)
+                max_scroll = max(0, len(self.files) - self._LIST_VISIBLE)
                 self.list_scroll_offset = min(max_scroll, self.list_scroll_offset + 1)
             elif event.key == pygame.K_RETURN and self.show_file_list:
                 self.show_file_list = False
@@ -180,17 +1269,12 @@ class FileNavigator:
             if event.button == 4 and self.show_file_list:  # Scroll up
                 self.list_scroll_offset = max(0, self.list_scroll_offset - 3)
             elif event.button == 5 and self.show_file_list:  # Scroll down
-                max_scroll = max(0, len(self.files) - 20)
+                max_scroll = max(0, len(self.files) - self._LIST_VISIBLE)
                 self.list_scroll_offset = min(max_scroll, self.list_scroll_offset + 3)
-            elif self.show_file_list and event.button == 1 and event.pos[0] < 320:
-                # Click on file list
-                # File list starts at pygame y=100 (below title at y=70)
-                # Each item is 22 pixels tall, pygame y increases downward
-                # Max 20 visible items, so valid area is y=100 to y=100+20*22=540
-                visible_files = 20
-                max_y = 100 + visible_files * 22
-                if 100 <= event.pos[1] < max_y:
-                    clicked_idx = self.list_scroll_offset + (event.pos[1] - 100) // 22
+            elif self.show_file_list and event.button == 1 and event.pos[0] < self._LIST_WIDTH:
+                # Click on file list, pygame y increases downward
+                if self._LIST_Y0 <= event.pos[1] < self._LIST_MAX_Y:
+                    clicked_idx = self.list_scroll_offset + (event.pos[1] - self._LIST_Y0) // self._LIST_ITEM_H
                     if 0 <= clicked_idx < len(self.files):
                         if self.switch_to_index(clicked_idx):
                             self.show_file_list = False
@@ -198,6 +1282,67 @@ class FileNavigator:
 
         return (None, None)
 
+    def _scroll_list(self, delta):
+        """Move the file list window by delta rows, clamped to the list"""
+        max_scroll = max(0, len(self.files) - self._LIST_VISIBLE)
+        self.list_scroll_offset = max(0, min(max_scroll, self.list_scroll_offset + delta))
+
+    def handle_events(self, events):
+        """
+        Handle a whole batch of pygame events (e.g. one pygame.event.get()).
+
+        Held arrow keys and wheel bursts are coalesced: list scrolling is summed
+        into one offset update and Left/Right presses into one switch_file call,
+        so at most one file switch is reported per batch.
+
+        Returns: (actions, events) where actions is a list of (action, data)
+        tuples as returned by handle_event, and events are the events the
+        viewer should still handle itself.
+        """
+        start_index = self.current_index
+        actions = []
+        passthrough = []
+        switch_delta = 0
+        scroll_delta = 0
+
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                switch_delta += -1 if event.key == pygame.K_LEFT else 1
+                continue
+
+            if self.show_file_list:
+                if event.type == pygame.KEYDOWN and event.key in (pygame.K_UP, pygame.K_DOWN):
+                    scroll_delta += -1 if event.key == pygame.K_UP else 1
+                    passthrough.append(event)
+                    continue
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button in (4, 5):
+                    scroll_delta += -3 if event.button == 4 else 3
+                    passthrough.append(event)
+                    continue
+
+            # Anything else may depend on the pending state, apply it first
+            if scroll_delta:
+                self._scroll_list(scroll_delta)
+                scroll_delta = 0
+            if switch_delta:
+                self.switch_file(switch_delta)
+                switch_delta = 0
+
+            action, data = self.handle_event(event)
+            if action == 'toggle_list':
+                actions.append((action, data))
+            elif action is None:
+                passthrough.append(event)
+
+        if scroll_delta:
+            self._scroll_list(scroll_delta)
+        if switch_delta:
+            self.switch_file(switch_delta)
+
+        if self.current_index != start_index:
+            actions.append(('switch', self.current_index))
+        return actions, passthrough
+
     def draw_overlay(self, extra_info=None, error=None, controls_hint=None):
         """
         Draw the file info overlay.
@@ -207,12 +1352,115 @@ class FileNavigator:
             error: Error message to show in red
             controls_hint: Custom controls hint (default shows navigation controls)
         """
+        if self._overlay_fbo is None:
+            self._create_overlay_fbo()
+
+        self.text_renderer.begin_2d()
+        try:
+            if not self._overlay_fbo:
+                self._draw_overlay_contents(extra_info, error, controls_hint)
+                return
+
+            # Only the static parts are cached; extra_info may change every frame
+            # (e.g. an animation frame counter) and is drawn on top afterwards
+            key = (self.current_index, self.list_scroll_offset, self.show_file_list,
+                   error, controls_hint)
+            if key != self._overlay_key:
+                self._overlay_key = key
+                glPushAttrib(GL_VIEWPORT_BIT)
+                glBindFramebuffer(GL_FRAMEBUFFER, self._overlay_fbo)
+                glViewport(0, 0, self.width, self.height)
+                glClearColor(0.0, 0.0, 0.0, 0.0)
+                glClear(GL_COLOR_BUFFER_BIT)
+                GLState.separate_alpha = True
+                GLState.blend_func = None
+                try:
+                    self._draw_overlay_contents(None, error, controls_hint)
+                finally:
+                    GLState.separate_alpha = False
+                    GLState.blend_func = None
+                    glBindFramebuffer(GL_FRAMEBUFFER, 0)
+                    glPopAttrib()
+
+            self._composite_overlay()
+            # The open file list covers this line, as in the uncached drawing order
+            if extra_info and self.files and not error and not self.show_file_list:
+                self.text_renderer.render(extra_info, 10, self.height - 55, (200, 200, 200))
+        finally:
+            self.text_renderer.end_2d()
+
+    def _create_overlay_fbo(self):
+        """Create the overlay render target, falling back to direct drawing without FBO support"""
+        try:
+            tex_id = glGenTextures(1)
+            glPushAttrib(GL_TEXTURE_BIT)
+            glBindTexture(GL_TEXTURE_2D, tex_id)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, self.width, self.height, 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+            glPopAttrib()
+
+            fbo = glGenFramebuffers(1)
+            glBindFramebuffer(GL_FRAMEBUFFER, fbo)
+            glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, tex_id, 0)
+            status = glCheckFramebufferStatus(GL_FRAMEBUFFER)
+            glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        except Exception as e:
+            print(f"Overlay FBO unavailable, drawing directly: {e}")
+            self._overlay_fbo = False
+            return
+
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            print(f"Overlay FBO incomplete (0x{status:x}), drawing directly")
+            glDeleteFramebuffers(1, [fbo])
+            delete_textures((tex_id,))
+            self._overlay_fbo = False
+            return
+        self._overlay_fbo = fbo
+        self._overlay_tex = tex_id
+
+    def _composite_overlay(self):
+        """Blend the cached premultiplied overlay over the frame with one fullscreen quad"""
+        self.text_renderer.begin_2d()
+
+        GLState.enable(GL_BLEND)
+        GLState.set_blend_func(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+        GLState.enable(GL_TEXTURE_2D)
+        glTexEnvi(GL_TEXTURE_ENV, GL_TEXTURE_ENV_MODE, GL_REPLACE)
+        glBindTexture(GL_TEXTURE_2D, self._overlay_tex)
+
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0); glVertex2f(0, 0)
+        glTexCoord2f(1, 0); glVertex2f(self.width, 0)
+        glTexCoord2f(1, 1); glVertex2f(self.width, self.height)
+        glTexCoord2f(0, 1); glVertex2f(0, self.height)
+        glEnd()
+
+        self.text_renderer.end_2d()
+
+    def invalidate(self):
+        """Drop cached overlay output and text textures (e.g. after a resize)"""
+        if self._overlay_fbo:
+            glDeleteFramebuffers(1, [self._overlay_fbo])
+            delete_textures((self._overlay_tex,))
+        self._overlay_fbo = None
+        self._overlay_tex = None
+        self._overlay_key = None
+        if self._bg_list is not None:
+            glDeleteLists(self._bg_list, 1)
+            self._bg_list = None
+        self.text_renderer.invalidate()
+
+    def _draw_overlay_contents(self, extra_info, error, controls_hint):
+        """Issue the overlay text and file list draws"""
         if not self.files:
             self.text_renderer.render("No files found!", 10, self.height - 30, (255, 100, 100), large=True)
             return
 
+        self.text_renderer.begin_batch()
+
         # Current file name at top
-        filename = os.path.basename(self.files[self.current_index])
+        filename = self._basenames[self.current_index]
         info_text = f"{filename} ({self.current_index + 1}/{len(self.files)})"
         self.text_renderer.render(info_text, 10, self.height - 30, (255, 255, 255), large=True)
 
@@ -227,65 +1475,74 @@ class FileNavigator:
         elif extra_info:
             self.text_renderer.render(extra_info, 10, self.height - 55, (200, 200, 200))
 
+        self.text_renderer.end_batch()
+
         # File list overlay
         if self.show_file_list:
             self.draw_file_list()
 
+    def _display_rows(self, visible_files):
+        """Get the visible file list rows, formatting them only when the window or selection moved"""
+        key = (self.list_scroll_offset, self.current_index)
+        if key == self._display_cache_key:
+            return self._display_cache
+
+        start = self.list_scroll_offset
+        end = min(start + visible_files, len(self.files))
+        rows = []
+        for (idx, name), y in zip(enumerate(self._basenames[start:end], start), self._row_y):
+            if len(name) > 35:
+                name = name[:32] + "..."
+            if idx == self.current_index:
+                color = (100, 255, 100)
+                prefix = "> "
+            else:
+                color = (220, 220, 220)
+                prefix = "  "
+            rows.append((f"{prefix}{idx + 1}. {name}", y, color))
+
+        self._display_cache = rows
+        self._display_cache_key = key
+        return rows
+
     def draw_file_list(self):
         """Draw the file list overlay"""
-        # Background
-        glPushAttrib(GL_ALL_ATTRIB_BITS)
-        glPushMatrix()
-        glMatrixMode(GL_PROJECTION)
-        glPushMatrix()
-        glLoadIdentity()
-        glOrtho(0, self.width, 0, self.height, -1, 1)
-        glMatrixMode(GL_MODELVIEW)
-        glLoadIdentity()
+        self.text_renderer.begin_2d()
 
-        glDisable(GL_DEPTH_TEST)
-        glDisable(GL_TEXTURE_2D)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        # Background
+        GLState.disable(GL_TEXTURE_2D)
+        GLState.enable(GL_BLEND)
+        GLState.set_blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
-        # Semi-transparent background
+        # Semi-transparent background, compiled into a display list on first use
         glColor4f(0.1, 0.1, 0.1, 0.9)
-        glBegin(GL_QUADS)
-        glVertex2f(0, 0)
-        glVertex2f(320, 0)
-        glVertex2f(320, self.height)
-        glVertex2f(0, self.height)
-        glEnd()
+        if self._bg_list is None:
+            self._bg_list = glGenLists(1)
+            glNewList(self._bg_list, GL_COMPILE)
+            glBegin(GL_QUADS)
+            glVertex2f(0, 0)
+            glVertex2f(self._LIST_WIDTH, 0)
+            glVertex2f(self._LIST_WIDTH, self.height)
+            glVertex2f(0, self.height)
+            glEnd()
+            glEndList()
+        glCallList(self._bg_list)
 
-        glMatrixMode(GL_PROJECTION)
-        glPopMatrix()
-        glMatrixMode(GL_MODELVIEW)
-        glPopMatrix()
-        glPopAttrib()
+        self.text_renderer.begin_batch()
 
         # Title
         ext_name = self.extension.upper().replace('.', '')
         self.text_renderer.render(f"{ext_name} Files (scroll/arrows, click to select):", 10, self.height - 70, (255, 255, 100))
 
         # File list
-        visible_files = 20
-        y_start = self.height - 100
-        for i in range(visible_files):
-            idx = self.list_scroll_offset + i
-            if idx >= len(self.files):
-                break
-            name = os.path.basename(self.files[idx])
-            if len(name) > 35:
-                name = name[:32] + "..."
-            if idx == self.current_index:
-                color = (100, 255, 100)
-                prefix = "> "
-            else:
-                color = (220, 220, 220)
-                prefix = "  "
-            self.text_renderer.render(f"{prefix}{idx + 1}. {name}", 10, y_start - i * 22, color)
+        visible_files = self._LIST_VISIBLE
+        for text, y, color in self._display_rows(visible_files):
+            self.text_renderer.render(text, 10, y, color)
 
         # Scroll indicator
         if len(self.files) > visible_files:
             scroll_info = f"Showing {self.list_scroll_offset + 1}-{min(self.list_scroll_offset + visible_files, len(self.files))} of {len(self.files)}"
             self.text_renderer.render(scroll_info, 10, 35, (150, 150, 150))
+
+        self.text_renderer.end_batch()
+        self.text_renderer.end_2d()
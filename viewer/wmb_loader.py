@@ -1,30 +1,320 @@
+import hashlib
+import mmap
+import os
+import pickle
 import struct
+from collections import namedtuple
 import numpy as np
+from cache_paths import CACHE_ROOT
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# WMB7 block records, read as zero-copy views over the file buffer
+BLOCK_VERT_DT = np.dtype([('pos', '<f4', 3), ('uv', '<f4', 2), ('lm_uv', '<f4', 2)])  # 28 bytes
+BLOCK_TRI_DT = np.dtype([('indices', '<i2', 3), ('skin', '<i2'), ('unused', '<u4')])   # 12 bytes
+BLOCK_SKIN_DT = np.dtype([('texture', '<i2'), ('lightmap', '<i2'), ('material', '<u4'),
+                          ('ambient', '<f4'), ('albedo', '<f4'), ('flags', '<u4')])    # 20 bytes
+
+# Precompiled record layouts for the loops that still unpack per record
+_S_BLOCK_HDR = struct.Struct('<6f4I')
+_S_TEX_HDR = struct.Struct('<16s3I')  # name, width, height, type
+_S_MAT_NAME = struct.Struct('<20s')
+
+# Object payloads by type, offsets relative to the start of the object (type field)
+OBJECT_TYPES = {
+    5: ('INFO', np.dtype({'names': ['origin', 'azimuth', 'elevation'],
+                         'formats': [('<f4', 3), '<f4', '<f4'],
+                         'offsets': [4, 16, 20], 'itemsize': 24})),
+    1: ('POSITION', np.dtype({'names': ['origin', 'angle', 'pos_name'],
+                             'formats': [('<f4', 3), ('<f4', 3), 'S20'],
+                             'offsets': [4, 16, 36], 'itemsize': 56})),
+    2: ('LIGHT', np.dtype({'names': ['origin', 'color', 'range'],
+                          'formats': [('<f4', 3), ('<f4', 3), '<f4'],
+                          'offsets': [4, 16, 28], 'itemsize': 32})),
+    3: ('OLD_ENTITY', np.dtype({'names': ['origin', 'angle', 'scale', 'ent_name', 'filename'],
+                               'formats': [('<f4', 3), ('<f4', 3), ('<f4', 3), 'S20', 'S13'],
+                               'offsets': [4, 16, 28, 40, 60], 'itemsize': 73})),
+    7: ('ENTITY', np.dtype({'names': ['origin', 'angle', 'scale', 'ent_name', 'filename'],
+                           'formats': [('<f4', 3), ('<f4', 3), ('<f4', 3), 'S33', 'S33'],
+                           'offsets': [4, 16, 28, 40, 73], 'itemsize': 106})),
+}
+
+
+def _decode_name(raw):
+    """Decode a fixed-size, null-terminated name field"""
+    end = raw.find(b'\x00')
+    if end >= 0:
+        raw = raw[:end]
+    return raw.decode('latin-1')
+
+
+def _decode_names(col):
+    """Decode a column of fixed-size name fields ('S' dtype) in one pass"""
+    width = col.dtype.itemsize
+    # latin-1 maps bytes 1:1 to characters, so the record boundaries carry over
+    text = col.tobytes().decode('latin-1')
+    return [text[i:i + width].partition('\x00')[0] for i in range(0, len(text), width)]
+
+
+def _gather_records(raw, offsets, dtype):
+    """Copy fixed-size records at arbitrary byte offsets into one structured array"""
+    idx = offsets[:, None] + np.arange(dtype.itemsize)
+    return raw[idx].view(dtype).reshape(len(offsets))
+
+
+def _face_vertex_runs_numpy(fields, surfedges, edges):
+    """Resolve each face's surfedge run to vertex indices.
+
+    Returns (out_start, out_len, face_verts): face i's vertices are
+    face_verts[out_start[i]:out_start[i] + out_len[i]].
+    """
+    num_faces = len(fields)
+    first_surfedge = fields[:, 1].astype(np.int64)
+    # tex_info low 16 bits = num_verts
+    num_verts = fields[:, 2] & 0xFFFF
+
+    # Resolve every surfedge to its directed (v1, v2) edge once.
+    # Surfedges are 1-indexed signed ints; negative means reversed edge.
+    surfedges = surfedges.astype(np.int64)
+    edge_idx = np.abs(surfedges) - 1
+    edge_ok = (edge_idx >= 0) & (edge_idx < len(edges))
+    pairs = np.zeros((len(surfedges), 2), dtype=np.int64)
+    pairs[edge_ok] = edges[edge_idx[edge_ok]]
+    neg = surfedges < 0
+    pairs[neg] = pairs[neg, ::-1]
+
+    # Each face's run of surfedges, clipped to the surfedge table
+    start = np.minimum(first_surfedge, len(surfedges))
+    count = np.minimum(first_surfedge + num_verts, len(surfedges)) - start
+    run_start = np.cumsum(count) - count
+    se_idx = np.repeat(start - run_start, count) + np.arange(count.sum())
+    face_of = np.repeat(np.arange(num_faces), count)
+
+    # Skip invalid edges; the first remaining edge of a face contributes
+    # v1 and v2, every later one just v2
+    keep = edge_ok[se_idx]
+    se_idx = se_idx[keep]
+    face_of = face_of[keep]
+    kept = np.bincount(face_of, minlength=num_faces)
+    kept_start = np.cumsum(kept) - kept
+    out_len = kept + (kept > 0)
+    out_start = np.cumsum(out_len) - out_len
+
+    face_verts = np.empty(int(out_len.sum()), dtype=np.int64)
+    v2_pos = out_start[face_of] + 1 + np.arange(len(se_idx)) - kept_start[face_of]
+    face_verts[v2_pos] = pairs[se_idx, 1]
+    has_verts = kept > 0
+    face_verts[out_start[has_verts]] = pairs[se_idx[kept_start[has_verts]], 0]
+
+    return out_start, out_len, face_verts
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _face_vertex_runs_numba(fields, surfedges, edges):
+        num_faces = fields.shape[0]
+        num_surfedges = surfedges.shape[0]
+        num_edges = edges.shape[0]
+
+        # Upper bound: every surfedge in range, plus the leading v1 per face
+        total = 0
+        for i in range(num_faces):
+            first = np.int64(fields[i, 1])
+            end = min(first + np.int64(fields[i, 2] & 0xFFFF), num_surfedges)
+            if end > first:
+                total += end - first + 1
+
+        out_start = np.empty(num_faces, dtype=np.int64)
+        out_len = np.zeros(num_faces, dtype=np.int64)
+        face_verts = np.empty(total, dtype=np.int64)
+        pos = 0
+        for i in range(num_faces):
+            out_start[i] = pos
+            first = np.int64(fields[i, 1])
+            end = min(first + np.int64(fields[i, 2] & 0xFFFF), num_surfedges)
+            for j in range(first, end):
+                surfedge = np.int64(surfedges[j])
+                edge_idx = abs(surfedge) - 1
+                if edge_idx < 0 or edge_idx >= num_edges:
+                    continue
+                v1 = np.int64(edges[edge_idx, 0])
+                v2 = np.int64(edges[edge_idx, 1])
+                if surfedge < 0:
+                    v1, v2 = v2, v1
+                if pos == out_start[i]:
+                    face_verts[pos] = v1
+                    pos += 1
+                face_verts[pos] = v2
+                pos += 1
+            out_len[i] = pos - out_start[i]
+
+        return out_start, out_len, face_verts[:pos]
+
+    _face_vertex_runs = _face_vertex_runs_numba
+else:
+    _face_vertex_runs = _face_vertex_runs_numpy
+
+
+# Parsed files are cached per user, keyed by content hash. Bump CACHE_VERSION
+# whenever the parsed layout changes so old entries are ignored.
+CACHE_VERSION = 5
+CACHE_DIR = os.path.join(CACHE_ROOT, 'wmb')
+_UNCACHED = ('_mm', '_data', 'verbose', 'cache')
+
+
+def _mapped_base(obj):
+    """Return the object ultimately backing a view (e.g. the mmap for file views)"""
+    while isinstance(obj, np.ndarray):
+        obj = obj.base
+    if isinstance(obj, memoryview):
+        obj = obj.obj
+    return obj
+
+
+class _CachePickler(pickle.Pickler):
+    """Pickles views into the mapped file as offsets instead of copying their bytes"""
+
+    def __init__(self, f, mm):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._mm = mm
+        self._base = np.frombuffer(mm, dtype=np.uint8).ctypes.data
+
+    def persistent_id(self, obj):
+        if isinstance(obj, memoryview) and obj.obj is self._mm and obj.nbytes:
+            return ('mv', np.frombuffer(obj, dtype=np.uint8).ctypes.data - self._base, obj.nbytes)
+        if isinstance(obj, np.ndarray) and obj.size and _mapped_base(obj) is self._mm:
+            return ('nd', obj.ctypes.data - self._base, obj.dtype, obj.shape, obj.strides)
+        return None
+
+
+class _CacheUnpickler(pickle.Unpickler):
+    """Rebuilds file views pickled by _CachePickler over the newly mapped file"""
+
+    def __init__(self, f, data):
+        super().__init__(f)
+        self._data = data
+
+    def persistent_load(self, pid):
+        if pid[0] == 'mv':
+            _, offset, size = pid
+            return self._data[offset:offset + size]
+        _, offset, dtype, shape, strides = pid
+        return np.ndarray(shape, dtype=dtype, buffer=self._data, offset=offset, strides=strides)
+
+
+Face = namedtuple('Face', ['flags', 'first_edge', 'num_verts', 'tex_idx', 'skin', 'vertices'])
+
 
 class WMB:
-    def __init__(self):
+    # Derived caches (e.g. the viewers' batch cache) include this in their keys
+    cache_version = CACHE_VERSION
+
+    def __init__(self, verbose=False, cache=True):
         self.header = {}
         self.textures = []
         self.materials = []
         self.blocks = []      # WMB7 blocks
+        self.block_bounds = np.empty((0, 2, 3), dtype=np.float32)  # (mins, maxs) per block
         self.objects = []
         self.lightmaps = []
         self.info = None
         # WMB6 specific
-        self.vertices = []    # Raw vertex positions
-        self.edges = []       # Edge list (v1, v2) pairs
-        self.surfedges = []   # Face edge references (1-indexed signed)
-        self.faces = []       # Face data
+        self.vertices = np.empty((0, 3), dtype=np.float32)  # Raw vertex positions (N, 3)
+        self.edges = np.empty((0, 2), dtype=np.uint32)      # Edge list (v1, v2) pairs (N, 2)
+        self.surfedges = np.empty(0, dtype=np.int32)        # Face edge references (1-indexed signed)
+        # Faces as struct-of-arrays; see face(i) for a per-face view
+        self.face_flags = np.empty(0, dtype=np.uint32)
+        self.face_first_edge = np.empty(0, dtype=np.uint32)
+        self.face_num_verts = np.empty(0, dtype=np.uint32)
+        self.face_tex_idx = np.empty(0, dtype=np.uint32)
+        self.face_skin = np.empty(0, dtype=np.uint32)
+        self.face_vert_starts = np.zeros(1, dtype=np.uint32)   # CSR offsets into face_vert_indices
+        self.face_vert_indices = np.empty(0, dtype=np.uint32)  # Vertex indices of all faces
         self.texinfo = []     # Texture info (UV mapping + texture index)
+        # The same texinfo as arrays: S/T planes (xyz + offset) and texture index per entry
+        self.texinfo_planes = np.empty((0, 2, 4), dtype=np.float32)
+        self.texinfo_texture = np.empty(0, dtype=np.uint32)
         self.version = None
+        self._mm = None       # Backing file mapping, kept alive for the data views
+        self._data = None     # Whole-file buffer (memoryview over _mm, or bytes)
+        self.verbose = verbose  # Print per-list/per-record details while loading
+        self.cache = cache      # Reuse/store parse results in CACHE_DIR
+
+    def _log(self, msg):
+        if self.verbose:
+            print(msg)
+
+    @property
+    def num_faces(self):
+        return len(self.face_flags)
+
+    def face(self, index):
+        """Return face `index` as a Face tuple; vertices is a view into the CSR table"""
+        starts = self.face_vert_starts
+        return Face(int(self.face_flags[index]), int(self.face_first_edge[index]),
+                    int(self.face_num_verts[index]), int(self.face_tex_idx[index]), int(self.face_skin[index]),
+                    self.face_vert_indices[starts[index]:starts[index + 1]])
 
     def load(self, filename):
         with open(filename, 'rb') as f:
-            data = f.read()
-
+            try:
+                # Map the file so texture/lightmap payloads can be sliced without copies
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                data = memoryview(self._mm)
+            except (ValueError, OSError):
+                # Empty files (and some special files) can't be mapped
+                data = f.read()
+        self._data = data
+
+        cache_path = None
+        if self.cache and self._mm is not None:
+            key = hashlib.blake2b(data, digest_size=16).hexdigest()
+            cache_path = os.path.join(CACHE_DIR, f"{os.path.basename(filename)}.{key}.v{CACHE_VERSION}.pickle")
+            if self._load_cache(cache_path, data):
+                return
+
+        self._parse(data)
+
+        if cache_path:
+            self._save_cache(cache_path)
+
+    def _load_cache(self, path, data):
+        """Restore parse results from the cache; returns False on a miss"""
+        try:
+            with open(path, 'rb') as f:
+                state = _CacheUnpickler(f, data).load()
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Ignoring WMB cache {path}: {e}")
+            return False
+
+        self.__dict__.update(state)
+        print(f"Loaded {self.version.decode('latin-1')} from cache: textures={len(self.textures)}")
+        return True
+
+    def _save_cache(self, path):
+        state = {k: v for k, v in self.__dict__.items() if k not in _UNCACHED}
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                _CachePickler(f, self._mm).dump(state)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError) as e:
+            print(f"Could not write WMB cache {path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _parse(self, data):
         # Read version identifier
         self.version = struct.unpack_from('<4s', data, 0)[0]
-        print(f"WMB version: {self.version}")
+        self._log(f"WMB version: {self.version}")
 
         if self.version == b'WMB7':
             self._load_wmb7(data)
@@ -54,7 +344,7 @@ class WMB:
             self.header['lists'][name] = {'offset': list_offset, 'length': list_length}
             offset += 8
             if list_length > 0 and list_offset < len(data):
-                print(f"  {name}: offset={list_offset}, length={list_length}")
+                self._log(f"  {name}: offset={list_offset}, length={list_length}")
 
         # Load textures (same format as WMB6)
         self._load_textures(data)
@@ -74,7 +364,7 @@ class WMB:
         # Load objects
         self._load_objects(data)
 
-        print(f"Loaded WMB4: textures={len(self.textures)}, verts={len(self.vertices)}, faces={len(self.faces)}")
+        print(f"Loaded WMB4: textures={len(self.textures)}, verts={len(self.vertices)}, faces={self.num_faces}")
 
     def _load_wmb6(self, data):
         """Load WMB6 format (A6 engine)"""
@@ -95,7 +385,7 @@ class WMB:
             self.header['lists'][name] = {'offset': list_offset, 'length': list_length}
             offset += 8
             if list_length > 0 and list_offset < len(data):
-                print(f"  {name}: offset={list_offset}, length={list_length}")
+                self._log(f"  {name}: offset={list_offset}, length={list_length}")
 
         # Load textures
         self._load_textures(data)
@@ -115,7 +405,7 @@ class WMB:
         # Load objects
         self._load_objects(data)
 
-        print(f"Loaded WMB6: textures={len(self.textures)}, verts={len(self.vertices)}, faces={len(self.faces)}")
+        print(f"Loaded WMB6: textures={len(self.textures)}, verts={len(self.vertices)}, faces={self.num_faces}")
 
     def _load_wmb6_texinfo(self, data):
         """Load WMB6 texinfo (UV mapping vectors + texture index)"""
@@ -129,23 +419,19 @@ class WMB:
         # s_vec[3], s_offset, t_vec[3], t_offset, texture_idx, flags, padding
         num_texinfo = mat_list['length'] // 64
 
-        print(f"Loading {num_texinfo} texinfo entries...")
-        for i in range(num_texinfo):
-            s_vec = struct.unpack_from('<3f', data, offset)
-            s_off = struct.unpack_from('<f', data, offset + 12)[0]
-            t_vec = struct.unpack_from('<3f', data, offset + 16)
-            t_off = struct.unpack_from('<f', data, offset + 28)[0]
-            tex_idx, flags = struct.unpack_from('<2I', data, offset + 32)
-
-            self.texinfo.append({
-                's_vec': s_vec,
-                's_off': s_off,
-                't_vec': t_vec,
-                't_off': t_off,
-                'texture': tex_idx,
-                'flags': flags
-            })
-            offset += 64
+        self._log(f"Loading {num_texinfo} texinfo entries...")
+        records = np.frombuffer(data, dtype='<u4', count=num_texinfo * 16, offset=offset).reshape(num_texinfo, 16)
+        self.texinfo_planes = records[:, :8].view('<f4').reshape(num_texinfo, 2, 4)
+        self.texinfo_texture = records[:, 8]
+        floats = self.texinfo_planes.reshape(num_texinfo, 8).tolist()
+        self.texinfo = [{
+            's_vec': tuple(vals[0:3]),
+            's_off': vals[3],
+            't_vec': tuple(vals[4:7]),
+            't_off': vals[7],
+            'texture': tex_idx,
+            'flags': flags
+        } for vals, (tex_idx, flags) in zip(floats, records[:, 8:10].tolist())]
 
     def _load_wmb6_vertices(self, data):
         """Load WMB6 vertices (3 floats per vertex)"""
@@ -156,11 +442,8 @@ class WMB:
         offset = vert_list['offset']
         num_verts = vert_list['length'] // 12  # 3 floats * 4 bytes
 
-        print(f"Loading {num_verts} vertices...")
-        for i in range(num_verts):
-            x, y, z = struct.unpack_from('<3f', data, offset)
-            self.vertices.append((x, y, z))
-            offset += 12
+        self._log(f"Loading {num_verts} vertices...")
+        self.vertices = np.frombuffer(data, dtype='<f4', count=num_verts * 3, offset=offset).reshape(num_verts, 3)
 
     def _load_wmb6_edges(self, data):
         """Load WMB6 edges (pairs of vertex indices)"""
@@ -171,11 +454,8 @@ class WMB:
         offset = edge_list['offset'] + 8  # Skip 8-byte header
         num_edges = (edge_list['length'] - 8) // 8  # 2 ints per edge
 
-        print(f"Loading {num_edges} edges...")
-        for i in range(num_edges):
-            v1, v2 = struct.unpack_from('<2I', data, offset)
-            self.edges.append((v1, v2))
-            offset += 8
+        self._log(f"Loading {num_edges} edges...")
+        self.edges = np.frombuffer(data, dtype='<u4', count=num_edges * 2, offset=offset).reshape(num_edges, 2)
 
     def _load_wmb6_surfedges(self, data):
         """Load WMB6 surfedges (face edge references, 1-indexed signed ints)"""
@@ -187,12 +467,8 @@ class WMB:
         offset = surfedge_list['offset']
         num_surfedges = surfedge_list['length'] // 4
 
-        print(f"Loading {num_surfedges} surfedges...")
-        self.surfedges = []
-        for i in range(num_surfedges):
-            val = struct.unpack_from('<i', data, offset)[0]
-            self.surfedges.append(val)
-            offset += 4
+        self._log(f"Loading {num_surfedges} surfedges...")
+        self.surfedges = np.frombuffer(data, dtype='<i4', count=num_surfedges, offset=offset)
 
     def _load_wmb6_faces(self, data):
         """Load WMB6 faces"""
@@ -206,50 +482,21 @@ class WMB:
         offset = face_list['offset']
         num_faces = face_list['length'] // 24  # 24 bytes per face
 
-        print(f"Loading {num_faces} faces...")
-        for i in range(num_faces):
-            vals = struct.unpack_from('<6I', data, offset)
-            flags = vals[0]
-            first_surfedge = vals[1]
-            tex_info = vals[2]
-            skin = vals[5]
-
-            # tex_info low 16 bits = num_verts
-            num_verts = tex_info & 0xFFFF
-            tex_idx = (tex_info >> 16) & 0xFFFF
-
-            # Build vertex list using surfedges
-            # Surfedges are 1-indexed signed ints pointing to edges
-            face_verts = []
-            for e in range(num_verts):
-                surfedge_idx = first_surfedge + e
-                if surfedge_idx >= len(self.surfedges):
-                    continue
+        self._log(f"Loading {num_faces} faces...")
+        fields = np.frombuffer(data, dtype='<u4', count=num_faces * 6, offset=offset).reshape(num_faces, 6)
+        out_start, out_len, face_verts = _face_vertex_runs(fields, self.surfedges, self.edges)
 
-                surfedge = self.surfedges[surfedge_idx]
-                # Convert 1-indexed to 0-indexed
-                edge_idx = abs(surfedge) - 1
-                if edge_idx < 0 or edge_idx >= len(self.edges):
-                    continue
-
-                v1, v2 = self.edges[edge_idx]
-                # Negative surfedge means reverse edge direction
-                if surfedge < 0:
-                    v1, v2 = v2, v1
+        # Face header columns; tex_info low 16 bits = num_verts, high 16 bits = texinfo index
+        self.face_flags = fields[:, 0]
+        self.face_first_edge = fields[:, 1]
+        self.face_num_verts = fields[:, 2] & 0xFFFF
+        self.face_tex_idx = fields[:, 2] >> 16
+        self.face_skin = fields[:, 5]
 
-                if len(face_verts) == 0:
-                    face_verts.append(v1)
-                face_verts.append(v2)
-
-            self.faces.append({
-                'flags': flags,
-                'first_edge': first_surfedge,
-                'num_verts': num_verts,
-                'tex_idx': tex_idx,
-                'skin': skin,
-                'vertices': face_verts
-            })
-            offset += 24
+        # CSR vertex table: face i uses face_vert_indices[starts[i]:starts[i + 1]].
+        # The runs are laid out back to back, so the starts plus the total are the offsets.
+        self.face_vert_starts = np.append(out_start, len(face_verts)).astype(np.uint32)
+        self.face_vert_indices = face_verts.astype(np.uint32)
 
     def _load_wmb7(self, data):
         """Load WMB7 format"""
@@ -269,7 +516,7 @@ class WMB:
             self.header['lists'][name] = {'offset': list_offset, 'length': list_length}
             offset += 8
             if list_length > 0 and list_offset < len(data):
-                print(f"  {name}: offset={list_offset}, length={list_length}")
+                self._log(f"  {name}: offset={list_offset}, length={list_length}")
 
         self._load_textures(data)
         self._load_materials(data)
@@ -287,20 +534,17 @@ class WMB:
         offset = tex_list['offset']
         num_textures = struct.unpack_from('<I', data, offset)[0]
         offset += 4
-        print(f"Loading {num_textures} textures...")
+        self._log(f"Loading {num_textures} textures...")
 
-        tex_offsets = []
-        for i in range(num_textures):
-            tex_off = struct.unpack_from('<I', data, offset)[0]
-            tex_offsets.append(tex_off)
-            offset += 4
+        tex_offsets = np.frombuffer(data, dtype='<u4', count=num_textures, offset=offset).tolist()
 
+        textures = [None] * num_textures
+        unpack_header = _S_TEX_HDR.unpack_from
         for i, tex_off in enumerate(tex_offsets):
             abs_offset = tex_list['offset'] + tex_off
 
-            name = struct.unpack_from('<16s', data, abs_offset)[0]
-            name = name.strip(b'\x00').decode('utf-8', errors='ignore')
-            width, height, tex_type = struct.unpack_from('<III', data, abs_offset + 16)
+            name, width, height, tex_type = unpack_header(data, abs_offset)
+            name = _decode_name(name)
             abs_offset += 16 + 4 * 4  # Skip header (40 bytes total)
 
             texture = {
@@ -308,8 +552,11 @@ class WMB:
                 'width': width,
                 'height': height,
                 'type': tex_type,
-                'data': None
+                # Payload location; sliced on demand by get_texture_data()
+                '_offset': abs_offset,
+                '_size': None
             }
+            size = None
 
             # WMB4/WMB6 uses different type encoding than WMB7
             if self.version in [b'WMB4', b'WMB6']:
@@ -318,15 +565,12 @@ class WMB:
                 if tex_type in [40, 8, 2]:  # RGB565
                     texture['format'] = 'rgb565'
                     size = width * height * 2
-                    texture['data'] = data[abs_offset:abs_offset + size]
                 elif tex_type in [48, 16, 4]:  # RGB888
                     texture['format'] = 'rgb888'
                     size = width * height * 3
-                    texture['data'] = data[abs_offset:abs_offset + size]
                 elif tex_type in [56, 24, 5]:  # RGBA8888
                     texture['format'] = 'rgba8888'
                     size = width * height * 4
-                    texture['data'] = data[abs_offset:abs_offset + size]
                 else:
                     # Try to detect from legacy field (size info)
                     legacy = struct.unpack_from('<I', data, abs_offset - 12)[0]
@@ -334,7 +578,6 @@ class WMB:
                     if legacy == expected_16bit or abs(legacy - expected_16bit) < 100:
                         texture['format'] = 'rgb565'
                         size = width * height * 2
-                        texture['data'] = data[abs_offset:abs_offset + size]
                     else:
                         texture['format'] = 'unknown'
             else:
@@ -343,30 +586,36 @@ class WMB:
                 base_type = tex_type & 7
 
                 if base_type == 6:
-                    dds_size = width
+                    size = width  # DDS payload size is stored in the width field
                     texture['format'] = 'dds'
-                    texture['data'] = data[abs_offset:abs_offset + dds_size]
                 elif base_type == 5:
                     texture['format'] = 'rgba8888'
                     size = width * height * 4
-                    texture['data'] = data[abs_offset:abs_offset + size]
                 elif base_type == 4:
                     texture['format'] = 'rgb888'
                     size = width * height * 3
-                    texture['data'] = data[abs_offset:abs_offset + size]
                 elif base_type == 2:
                     texture['format'] = 'rgb565'
                     size = width * height * 2
-                    texture['data'] = data[abs_offset:abs_offset + size]
                 elif base_type == 0:
                     texture['format'] = 'palette8'
                     size = width * height
-                    texture['data'] = data[abs_offset:abs_offset + size]
                 else:
                     texture['format'] = 'unknown'
 
-            self.textures.append(texture)
-            print(f"  Texture {i}: '{name}' {width}x{height} {texture['format']}")
+            texture['_size'] = size
+            textures[i] = texture
+            self._log(f"  Texture {i}: '{name}' {width}x{height} {texture['format']}")
+
+        self.textures = textures
+
+    def get_texture_data(self, index):
+        """Return the raw payload of texture `index` (a view into the file), or None"""
+        texture = self.textures[index]
+        if texture['_size'] is None:
+            return None
+        offset = texture['_offset']
+        return self._data[offset:offset + texture['_size']]
 
     def _load_materials(self, data):
         mat_list = self.header['lists']['materials']
@@ -376,11 +625,11 @@ class WMB:
         num_materials = mat_list['length'] // 64
         offset = mat_list['offset']
 
-        for i in range(num_materials):
-            mat_name = struct.unpack_from('<20s', data, offset + 44)[0]
-            mat_name = mat_name.strip(b'\x00').decode('utf-8', errors='ignore')
-            self.materials.append(mat_name)
-            offset += 64
+        unpack_name = _S_MAT_NAME.unpack_from
+        self.materials = [
+            _decode_name(unpack_name(data, offset + i * 64 + 44)[0])
+            for i in range(num_materials)
+        ]
 
     def _load_lightmaps(self, data):
         lm_list = self.header['lists']['lightmaps']
@@ -391,15 +640,13 @@ class WMB:
         num_lightmaps = lm_list['length'] // lm_size
         offset = lm_list['offset']
 
-        print(f"Loading {num_lightmaps} lightmaps...")
-        for i in range(num_lightmaps):
-            lm_data = data[offset:offset + lm_size]
-            self.lightmaps.append({
-                'width': 1024,
-                'height': 1024,
-                'data': lm_data
-            })
-            offset += lm_size
+        self._log(f"Loading {num_lightmaps} lightmaps...")
+        # Zero-copy views into the file buffer
+        self.lightmaps = [{
+            'width': 1024,
+            'height': 1024,
+            'data': np.frombuffer(data, dtype=np.uint8, count=lm_size, offset=offset + i * lm_size).reshape(1024, 1024, 3)
+        } for i in range(num_lightmaps)]
 
     def _load_blocks(self, data):
         blk_list = self.header['lists'].get('blocks')
@@ -410,13 +657,15 @@ class WMB:
         num_blocks = struct.unpack_from('<I', data, offset)[0]
         offset += 4
 
-        print(f"Loading {num_blocks} blocks...")
+        self._log(f"Loading {num_blocks} blocks...")
 
+        blocks = [None] * num_blocks
+        bounds = np.empty((num_blocks, 2, 3), dtype=np.float32)
+        unpack = _S_BLOCK_HDR.unpack_from
         for blk_idx in range(num_blocks):
-            block_fmt = '<6f4I'
-            block_size = struct.calcsize(block_fmt)
-            block_data = struct.unpack_from(block_fmt, data, offset)
-            offset += block_size
+            block_data = unpack(data, offset)
+            offset += _S_BLOCK_HDR.size
+            bounds[blk_idx].flat = block_data[0:6]
 
             block = {
                 'mins': block_data[0:3],
@@ -424,44 +673,22 @@ class WMB:
                 'content': block_data[6],
                 'num_verts': block_data[7],
                 'num_tris': block_data[8],
-                'num_skins': block_data[9],
-                'vertices': [],
-                'triangles': [],
-                'skins': []
+                'num_skins': block_data[9]
             }
 
-            for v_idx in range(block['num_verts']):
-                vx, vy, vz, tu, tv, su, sv = struct.unpack_from('<7f', data, offset)
-                offset += 28
-                block['vertices'].append({
-                    'pos': (vx, vy, vz),
-                    'uv': (tu, tv),
-                    'lm_uv': (su, sv)
-                })
-
-            for t_idx in range(block['num_tris']):
-                v1, v2, v3, skin, unused = struct.unpack_from('<4hI', data, offset)
-                offset += 12
-                block['triangles'].append({
-                    'indices': (v1, v2, v3),
-                    'skin': skin
-                })
-
-            for s_idx in range(block['num_skins']):
-                texture, lightmap, material = struct.unpack_from('<hhI', data, offset)
-                ambient, albedo = struct.unpack_from('<ff', data, offset + 8)
-                flags = struct.unpack_from('<I', data, offset + 16)[0]
-                offset += 20
-                block['skins'].append({
-                    'texture': texture,
-                    'lightmap': lightmap,
-                    'material': material,
-                    'ambient': ambient,
-                    'albedo': albedo,
-                    'flags': flags
-                })
-
-            self.blocks.append(block)
+            block['vertices'] = np.frombuffer(data, dtype=BLOCK_VERT_DT, count=block['num_verts'], offset=offset)
+            offset += block['num_verts'] * BLOCK_VERT_DT.itemsize
+
+            block['triangles'] = np.frombuffer(data, dtype=BLOCK_TRI_DT, count=block['num_tris'], offset=offset)
+            offset += block['num_tris'] * BLOCK_TRI_DT.itemsize
+
+            block['skins'] = np.frombuffer(data, dtype=BLOCK_SKIN_DT, count=block['num_skins'], offset=offset)
+            offset += block['num_skins'] * BLOCK_SKIN_DT.itemsize
+
+            blocks[blk_idx] = block
+
+        self.blocks = blocks
+        self.block_bounds = bounds
 
     def _load_objects(self, data):
         obj_list = self.header['lists']['objects']
@@ -472,55 +699,46 @@ class WMB:
         num_objects = struct.unpack_from('<I', data, offset)[0]
         offset += 4
 
-        print(f"Loading {num_objects} objects...")
-
-        obj_offsets = []
-        for i in range(num_objects):
-            obj_off = struct.unpack_from('<I', data, offset)[0]
-            obj_offsets.append(obj_off)
-            offset += 4
-
-        for i, obj_off in enumerate(obj_offsets):
-            abs_offset = obj_list['offset'] + obj_off
-            obj_type = struct.unpack_from('<I', data, abs_offset)[0]
-
-            obj = {'type': obj_type, 'index': i}
-
-            if obj_type == 5:  # WMB_INFO
-                obj['name'] = 'INFO'
-                obj['origin'] = struct.unpack_from('<3f', data, abs_offset + 4)
-                obj['azimuth'], obj['elevation'] = struct.unpack_from('<2f', data, abs_offset + 16)
-                self.info = obj
-
-            elif obj_type == 1:  # WMB_POSITION
-                obj['name'] = 'POSITION'
-                obj['origin'] = struct.unpack_from('<3f', data, abs_offset + 4)
-                obj['angle'] = struct.unpack_from('<3f', data, abs_offset + 16)
-                obj['pos_name'] = struct.unpack_from('<20s', data, abs_offset + 36)[0].strip(b'\x00').decode('utf-8', errors='ignore')
-
-            elif obj_type == 2:  # WMB_LIGHT
-                obj['name'] = 'LIGHT'
-                obj['origin'] = struct.unpack_from('<3f', data, abs_offset + 4)
-                obj['color'] = struct.unpack_from('<3f', data, abs_offset + 16)
-                obj['range'] = struct.unpack_from('<f', data, abs_offset + 28)[0]
-
-            elif obj_type == 3:  # WMB_OLD_ENTITY
-                obj['name'] = 'OLD_ENTITY'
-                obj['origin'] = struct.unpack_from('<3f', data, abs_offset + 4)
-                obj['angle'] = struct.unpack_from('<3f', data, abs_offset + 16)
-                obj['scale'] = struct.unpack_from('<3f', data, abs_offset + 28)
-                obj['ent_name'] = struct.unpack_from('<20s', data, abs_offset + 40)[0].strip(b'\x00').decode('utf-8', errors='ignore')
-                obj['filename'] = struct.unpack_from('<13s', data, abs_offset + 60)[0].strip(b'\x00').decode('utf-8', errors='ignore')
-
-            elif obj_type == 7:  # WMB_ENTITY
-                obj['name'] = 'ENTITY'
-                obj['origin'] = struct.unpack_from('<3f', data, abs_offset + 4)
-                obj['angle'] = struct.unpack_from('<3f', data, abs_offset + 16)
-                obj['scale'] = struct.unpack_from('<3f', data, abs_offset + 28)
-                obj['ent_name'] = struct.unpack_from('<33s', data, abs_offset + 40)[0].strip(b'\x00').decode('utf-8', errors='ignore')
-                obj['filename'] = struct.unpack_from('<33s', data, abs_offset + 73)[0].strip(b'\x00').decode('utf-8', errors='ignore')
+        self._log(f"Loading {num_objects} objects...")
+
+        # First pass: every object's offset and type
+        raw = np.frombuffer(data, dtype=np.uint8)
+        obj_offsets = np.frombuffer(data, dtype='<u4', count=num_objects, offset=offset).astype(np.int64)
+        obj_offsets += obj_list['offset']
+        obj_types = _gather_records(raw, obj_offsets, np.dtype('<u4'))
+
+        self.objects = [{'type': obj_type, 'index': i} for i, obj_type in enumerate(obj_types.tolist())]
+
+        # Bucket object indices by type in one stable sort (file order kept within a type)
+        order = np.argsort(obj_types, kind='stable')
+        bucket_types, bucket_starts = np.unique(obj_types[order], return_index=True)
+        buckets = np.split(order, bucket_starts[1:])
+
+        # Second pass: parse each known type as one structured array
+        for obj_type, indices in zip(bucket_types.tolist(), buckets):
+            if obj_type not in OBJECT_TYPES:
+                for i in indices.tolist():
+                    self.objects[i]['name'] = f'TYPE_{obj_type}'
+                continue
+
+            name, dtype = OBJECT_TYPES[obj_type]
+            records = _gather_records(raw, obj_offsets[indices], dtype)
+            columns = []
+            for field in dtype.names:
+                col = records[field]
+                if col.dtype.kind == 'S':
+                    values = _decode_names(col)
+                elif col.ndim > 1:
+                    values = [tuple(v) for v in col.tolist()]
+                else:
+                    values = col.tolist()
+                columns.append((field, values))
 
-            else:
-                obj['name'] = f'TYPE_{obj_type}'
+            for k, i in enumerate(indices.tolist()):
+                obj = self.objects[i]
+                obj['name'] = name
+                for field, values in columns:
+                    obj[field] = values[k]
 
-            self.objects.append(obj)
+            if obj_type == 5:  # WMB_INFO; the last one in the file wins
+                self.info = self.objects[int(indices[-1])]
@@ -1,22 +1,34 @@
 import pygame
 from pygame.locals import *
+# PyOpenGL flags must be set before the first OpenGL.GL import: skip the
+# glGetError round trip after every call and the per-call logging wrappers.
+# Nothing keeps client-memory arrays for later draws, so pointer storage is off too
+import OpenGL
+OpenGL.ERROR_CHECKING = False
+OpenGL.ERROR_LOGGING = False
+OpenGL.STORE_POINTERS = False
 from OpenGL.GL import *
 from OpenGL.GLU import *
-import numpy as np
 from wmb_loader import WMB
-from viewer_utils import FileNavigator
+from viewer_utils import (FileNavigator, INPUT_EVENTS, PixelUploader, ScratchBuffer, TexturePool, compressed_format,
+                          decode_wmb_textures, camera_vectors, camera_view_matrix,
+                          cached_world_batches, BatchListCache, upload_render_batches,
+                          sort_batches_by_texture, world_batch_bounds, frustum_visible, BATCH_STRIDE, BATCH_UV_OFFSET,
+                          open_gl_window, parse_viewer_args)
+import ctypes
+import queue
 import sys
 import os
-import math
+import threading
 import time
 
 
 class WMBViewer:
-    def __init__(self, folder=None):
+    def __init__(self, folder=None, vsync=False):
         self.width = 1024
         self.height = 768
         pygame.init()
-        self.screen = pygame.display.set_mode((self.width, self.height), DOUBLEBUF | OPENGL)
+        self.screen = open_gl_window((self.width, self.height), vsync)
         pygame.display.set_caption("WMB Viewer")
 
         # File navigation
@@ -38,13 +50,28 @@ class WMBViewer:
         glLoadIdentity()
         gluPerspective(60, (self.width / self.height), 1.0, 50000.0)
         glMatrixMode(GL_MODELVIEW)
+        # Kept for frustum culling; the projection never changes
+        self.projection = glGetFloatv(GL_PROJECTION_MATRIX)
+        self.view_projection = self.projection
 
         # WMB data
         self.wmb = None
         self.texture_ids = []
         self.lightmap_ids = []
-        self.triangulated_faces = []
         self.render_batches = []
+        self.world_vbo = None
+        self.world_ibo = None
+        self.world_bounds = None
+        self.world_lists = BatchListCache()
+        # Geometry is triangulated and batched on a worker thread; finished builds are
+        # queued with the load generation they belong to and uploaded from draw()
+        self.load_generation = 0
+        self.world_loading = False
+        self.pending_worlds = queue.SimpleQueue()
+        # Texture names are recycled across file switches
+        self.texture_pool = TexturePool()
+        # Unpacked texture pixels are decoded into one reused buffer
+        self.decode_scratch = ScratchBuffer()
         self.load_error = None
 
         # Camera state
@@ -58,6 +85,8 @@ class WMBViewer:
         self.mouse_captured = True
         pygame.mouse.set_visible(False)
         pygame.event.set_grab(True)
+        # Motion events would only flood the queue, the per-frame delta comes from get_rel()
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
 
         # Wireframe mode
         self.wireframe = False
@@ -79,6 +108,7 @@ class WMBViewer:
             'triangles': 0,
             'blocks': 0,
         }
+        self._pf_binds = self._pf_calls = self._pf_tris = self._pf_blocks = 0
 
         # Load first file
         self.load_current_file()
@@ -93,7 +123,17 @@ class WMBViewer:
 
         self.wmb = WMB()
         self.load_error = None
-        self.triangulated_faces = []
+        self.render_batches = []
+        self.world_bounds = None
+        # Finished builds of earlier files are discarded now; any still running
+        # belong to an older generation and are dropped on arrival
+        self.load_generation += 1
+        self.world_loading = False
+        while True:
+            try:
+                self.pending_worlds.get_nowait()
+            except queue.Empty:
+                break
 
         try:
             self.wmb.load(filename)
@@ -101,16 +141,18 @@ class WMBViewer:
             self.lightmap_ids = self.load_lightmaps()
             self.camera_pos = self.calculate_start_position()
 
-            # Pre-triangulate WMB4/WMB6 faces and build render batches
-            if self.wmb.version in [b'WMB4', b'WMB6']:
-                self.triangulated_faces = self.triangulate_faces()
-                self.render_batches = self.build_render_batches()
+            # Triangulate and batch in the background, the window keeps drawing meanwhile
+            if self.wmb.version in [b'WMB4', b'WMB6', b'WMB7']:
+                self.world_loading = True
+                threading.Thread(target=self.build_world,
+                                 args=(self.wmb, filename, list(self.texture_ids), self.load_generation),
+                                 daemon=True).start()
 
         except Exception as e:
             print(f"Error loading {filename}: {e}")
             self.load_error = str(e)
-            self.texture_ids = []
-            self.lightmap_ids = []
+            # Hand back whatever was uploaded before the failure
+            self.cleanup_textures()
             self.camera_pos = [0.0, 0.0, 100.0]
 
         self.camera_yaw = 0.0
@@ -118,15 +160,15 @@ class WMBViewer:
         pygame.display.set_caption(f"WMB Viewer - {os.path.basename(filename)}")
 
     def cleanup_textures(self):
-        """Delete OpenGL textures"""
-        for tex_id in self.texture_ids:
-            if tex_id is not None:
-                glDeleteTextures([tex_id])
-        for lm_id in self.lightmap_ids:
-            if lm_id is not None:
-                glDeleteTextures([lm_id])
+        """Release world textures and lightmaps to the pool and free the world buffers"""
+        self.texture_pool.release(self.texture_ids + self.lightmap_ids)
         self.texture_ids = []
         self.lightmap_ids = []
+        self.world_lists.clear()
+        if self.world_vbo is not None:
+            glDeleteBuffers(2, [self.world_vbo, self.world_ibo])
+            self.world_vbo = None
+            self.world_ibo = None
 
     def calculate_start_position(self):
         """Calculate a good starting camera position"""
@@ -138,191 +180,79 @@ class WMBViewer:
                 return pos
 
         # Find world bounds from vertices or blocks
-        if self.wmb.version in [b'WMB4', b'WMB6'] and self.wmb.vertices:
-            min_x = min(v[0] for v in self.wmb.vertices)
-            max_x = max(v[0] for v in self.wmb.vertices)
-            min_y = min(v[1] for v in self.wmb.vertices)
-            max_y = max(v[1] for v in self.wmb.vertices)
-            min_z = min(v[2] for v in self.wmb.vertices)
-            max_z = max(v[2] for v in self.wmb.vertices)
-        elif self.wmb.blocks:
-            min_x = min(b['mins'][0] for b in self.wmb.blocks)
-            max_x = max(b['maxs'][0] for b in self.wmb.blocks)
-            min_y = min(b['mins'][1] for b in self.wmb.blocks)
-            max_y = max(b['maxs'][1] for b in self.wmb.blocks)
-            min_z = min(b['mins'][2] for b in self.wmb.blocks)
-            max_z = max(b['maxs'][2] for b in self.wmb.blocks)
+        if self.wmb.version in [b'WMB4', b'WMB6'] and len(self.wmb.vertices):
+            mins = self.wmb.vertices.min(axis=0)
+            maxs = self.wmb.vertices.max(axis=0)
+        elif len(self.wmb.block_bounds):
+            # The loader keeps the block boxes as one (n, 2, 3) array; reduce each side
+            boxes = self.wmb.block_bounds
+            mins = boxes[:, 0].min(axis=0)
+            maxs = boxes[:, 1].max(axis=0)
         else:
             return [0.0, 0.0, 100.0]
 
-        center_x = (min_x + max_x) / 2
-        center_y = (min_y + max_y) / 2
-        center_z = (min_z + max_z) / 2 + 100
+        center = (mins + maxs) / 2
+        center[2] += 100
 
-        print(f"World bounds: ({min_x:.1f}, {min_y:.1f}, {min_z:.1f}) to ({max_x:.1f}, {max_y:.1f}, {max_z:.1f})")
-        print(f"Starting at: ({center_x:.1f}, {center_y:.1f}, {center_z:.1f})")
+        print(f"World bounds: ({mins[0]:.1f}, {mins[1]:.1f}, {mins[2]:.1f}) to ({maxs[0]:.1f}, {maxs[1]:.1f}, {maxs[2]:.1f})")
+        print(f"Starting at: ({center[0]:.1f}, {center[1]:.1f}, {center[2]:.1f})")
 
-        return [center_x, center_y, center_z]
+        return center.tolist()
 
-    def triangulate_faces(self):
-        """Convert polygon faces to triangles using fan triangulation"""
-        triangles = []
+    def build_world(self, wmb, filename, texture_ids, generation):
+        """Triangulate and batch the level geometry (worker thread, no GL calls)"""
+        try:
+            vertices, batches = cached_world_batches(wmb, filename)
+            batches = sort_batches_by_texture(batches, texture_ids)
+            result = (vertices, batches, world_batch_bounds(wmb, vertices, batches)), None
+        except Exception as e:
+            result = None, e
+        self.pending_worlds.put((generation, result))
 
-        for face in self.wmb.faces:
-            verts = face['vertices']
-            if len(verts) < 3:
+    def install_pending_world(self):
+        """Upload a finished background build; buffer creation has to stay on the GL thread"""
+        while True:
+            try:
+                generation, (world, error) = self.pending_worlds.get_nowait()
+            except queue.Empty:
+                return
+            if generation != self.load_generation:
                 continue
-
-            # Get texinfo for this face
-            texinfo_idx = face['tex_idx']
-            if texinfo_idx < len(self.wmb.texinfo):
-                texinfo = self.wmb.texinfo[texinfo_idx]
-                actual_tex = texinfo['texture']
-                s_vec = texinfo['s_vec']
-                s_off = texinfo['s_off']
-                t_vec = texinfo['t_vec']
-                t_off = texinfo['t_off']
-            else:
-                actual_tex = 0
-                s_vec = (1, 0, 0)
-                s_off = 0
-                t_vec = (0, 1, 0)
-                t_off = 0
-
-            # Get actual vertex positions and calculate UVs
-            positions = []
-            uvs = []
-            for v_idx in verts:
-                if v_idx < len(self.wmb.vertices):
-                    pos = self.wmb.vertices[v_idx]
-                    positions.append(pos)
-                    # Calculate UV using texinfo vectors (Quake-style)
-                    u = pos[0] * s_vec[0] + pos[1] * s_vec[1] + pos[2] * s_vec[2] + s_off
-                    v = pos[0] * t_vec[0] + pos[1] * t_vec[1] + pos[2] * t_vec[2] + t_off
-                    uvs.append((u, v))
-                else:
-                    positions.append((0, 0, 0))
-                    uvs.append((0, 0))
-
-            # Fan triangulation from first vertex
-            for i in range(1, len(positions) - 1):
-                triangles.append({
-                    'vertices': [positions[0], positions[i], positions[i + 1]],
-                    'uvs': [uvs[0], uvs[i], uvs[i + 1]],
-                    'texture': actual_tex,
-                    'flags': face['flags']
-                })
-
-        print(f"Triangulated {len(self.wmb.faces)} faces into {len(triangles)} triangles")
-        return triangles
-
-    def build_render_batches(self):
-        """Pre-build render batches grouped by texture with numpy arrays for vertex arrays"""
-        # Group triangles by texture
-        tex_groups = {}
-        for tri in self.triangulated_faces:
-            tex_idx = tri['texture']
-            if tex_idx not in tex_groups:
-                tex_groups[tex_idx] = []
-            tex_groups[tex_idx].append(tri)
-
-        batches = []
-        for tex_idx, tris in tex_groups.items():
-            # Get texture dimensions for UV scaling
-            tex_width = 64
-            tex_height = 64
-            if tex_idx < len(self.wmb.textures):
-                tex_width = self.wmb.textures[tex_idx]['width']
-                tex_height = self.wmb.textures[tex_idx]['height']
-
-            # Build separate position and UV arrays for vertex arrays
-            num_verts = len(tris) * 3
-            positions = np.empty((num_verts, 3), dtype=np.float32)
-            texcoords = np.empty((num_verts, 2), dtype=np.float32)
-
-            idx = 0
-            for tri in tris:
-                tri_verts = tri['vertices']
-                tri_uvs = tri['uvs']
-                for i in range(3):
-                    v = tri_verts[i]
-                    uv = tri_uvs[i]
-                    positions[idx] = (v[0], v[1], v[2])
-                    texcoords[idx] = (uv[0] / tex_width, uv[1] / tex_height)
-                    idx += 1
-
-            batches.append({
-                'texture_idx': tex_idx,
-                'positions': positions,
-                'texcoords': texcoords,
-                'vertex_count': num_verts
-            })
-
-        print(f"Built {len(batches)} render batches with vertex arrays")
-        return batches
+            self.world_loading = False
+            if error is not None:
+                print(f"Error building geometry: {error}")
+                self.load_error = str(error)
+                continue
+            vertices, self.render_batches, self.world_bounds = world
+            self.world_vbo, self.world_ibo = upload_render_batches(vertices, self.render_batches)
 
     def load_textures(self):
         """Load all textures into OpenGL"""
         texture_ids = []
 
-        for i, tex in enumerate(self.wmb.textures):
-            if tex['data'] is None or tex['format'] == 'unknown' or tex['format'] == 'dds':
-                texture_ids.append(None)
-                continue
+        with PixelUploader() as uploader:
+            for tex, decoded in zip(self.wmb.textures, decode_wmb_textures(self.wmb, self.decode_scratch)):
+                if decoded is None:
+                    texture_ids.append(None)
+                    continue
 
-            width = tex['width']
-            height = tex['height']
-
-            if tex['format'] == 'rgb565':
-                arr = np.frombuffer(tex['data'], dtype=np.uint16)
-                r = ((arr >> 11) & 0x1F) * 255 // 31
-                g = ((arr >> 5) & 0x3F) * 255 // 63
-                b = (arr & 0x1F) * 255 // 31
-                rgb = np.dstack((r, g, b)).astype(np.uint8).flatten()
-                texture_data = rgb.tobytes()
-                fmt = GL_RGB
-
-            elif tex['format'] == 'rgba8888':
-                arr = np.frombuffer(tex['data'], dtype=np.uint8).reshape(-1, 4)
-                rgba = arr[:, [2, 1, 0, 3]].flatten()
-                texture_data = rgba.tobytes()
-                fmt = GL_RGBA
-
-            elif tex['format'] == 'rgb888':
-                arr = np.frombuffer(tex['data'], dtype=np.uint8).reshape(-1, 3)
-                rgb = arr[:, ::-1].flatten()
-                texture_data = rgb.tobytes()
-                fmt = GL_RGB
-
-            elif tex['format'] == 'palette8':
-                # For 8-bit, create a simple colorful mapping for visibility
-                arr = np.frombuffer(tex['data'], dtype=np.uint8).astype(np.uint16)
-                r = (arr).astype(np.uint8)
-                g = ((arr * 2) % 256).astype(np.uint8)
-                b = ((arr * 3) % 256).astype(np.uint8)
-                rgb = np.dstack((r, g, b)).flatten()
-                texture_data = rgb.tobytes()
-                fmt = GL_RGB
+                width = tex['width']
+                height = tex['height']
+                texture_data, fmt = decoded
 
-            else:
-                texture_ids.append(None)
-                continue
-
-            tex_id = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, tex_id)
-
-            if fmt == GL_RGBA:
-                glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, texture_data)
-            else:
-                glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, texture_data)
+                # Compressed storage cuts the memory and bandwidth of sampling the world
+                internal_fmt = compressed_format(fmt, width, height)
+                tex_id, has_storage = self.texture_pool.acquire(width, height, internal_fmt)
+                glBindTexture(GL_TEXTURE_2D, tex_id)
+                uploader.tex_image_2d(internal_fmt, width, height, fmt, texture_data, has_storage)
 
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
-            glGenerateMipmap(GL_TEXTURE_2D)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_REPEAT)
+                glGenerateMipmap(GL_TEXTURE_2D)
 
-            texture_ids.append(tex_id)
+                texture_ids.append(tex_id)
 
         print(f"Loaded {len([t for t in texture_ids if t is not None])} textures into OpenGL")
         return texture_ids
@@ -331,23 +261,21 @@ class WMBViewer:
         """Load all lightmaps into OpenGL"""
         lightmap_ids = []
 
-        for i, lm in enumerate(self.wmb.lightmaps):
-            width = lm['width']
-            height = lm['height']
+        with PixelUploader() as uploader:
+            for i, lm in enumerate(self.wmb.lightmaps):
+                width = lm['width']
+                height = lm['height']
 
-            arr = np.frombuffer(lm['data'], dtype=np.uint8).reshape(-1, 3)
-            rgb = arr[:, ::-1].flatten()
-            texture_data = rgb.tobytes()
+                # Lightmaps are stored BGR; upload straight from the file view
+                tex_id, has_storage = self.texture_pool.acquire(width, height, GL_RGB)
+                glBindTexture(GL_TEXTURE_2D, tex_id)
+                uploader.tex_image_2d(GL_RGB, width, height, GL_BGR, lm['data'], has_storage)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+                glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
 
-            tex_id = glGenTextures(1)
-            glBindTexture(GL_TEXTURE_2D, tex_id)
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, GL_RGB, GL_UNSIGNED_BYTE, texture_data)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-
-            lightmap_ids.append(tex_id)
+                lightmap_ids.append(tex_id)
 
         print(f"Loaded {len(lightmap_ids)} lightmaps into OpenGL")
         return lightmap_ids
@@ -357,22 +285,25 @@ class WMBViewer:
         self.mouse_captured = captured
         pygame.mouse.set_visible(not captured)
         pygame.event.set_grab(captured)
+        pygame.mouse.get_rel()  # Drop motion accumulated while released
 
     def handle_input(self, dt):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-            # Handle file navigation
-            action, data = self.file_nav.handle_event(event)
+        # Handle file navigation, coalesced over the whole event batch
+        events = pygame.event.get(eventtype=INPUT_EVENTS)
+        pygame.event.clear(pump=False)  # Discard the rest without converting them
+        actions, events = self.file_nav.handle_events(events)
+        for action, data in actions:
             if action == 'switch':
                 self.load_current_file()
-                continue
             elif action == 'toggle_list':
                 if data:  # List opened
                     self.set_mouse_capture(False)
-                continue
+
+        for event in events:
+            if event.type == pygame.QUIT:
+                self.texture_pool.delete_all()
+                pygame.quit()
+                sys.exit()
 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
@@ -382,6 +313,7 @@ class WMBViewer:
                     elif not self.mouse_captured:
                         self.set_mouse_capture(True)
                     else:
+                        self.texture_pool.delete_all()
                         pygame.quit()
                         sys.exit()
                 elif event.key == pygame.K_TAB:
@@ -401,11 +333,6 @@ class WMBViewer:
                     else:
                         glEnable(GL_CULL_FACE)
                         print("Culling: ON")
-            elif event.type == pygame.MOUSEMOTION and self.mouse_captured:
-                dx, dy = event.rel
-                self.camera_yaw += dx * self.mouse_sensitivity
-                self.camera_pitch -= dy * self.mouse_sensitivity
-                self.camera_pitch = max(-89.0, min(89.0, self.camera_pitch))
             elif event.type == pygame.MOUSEBUTTONDOWN and not self.mouse_captured:
                 # Click to recapture mouse (unless on file list)
                 if not self.file_nav.show_file_list or event.pos[0] > 320:
@@ -415,77 +342,59 @@ class WMBViewer:
         if not self.mouse_captured:
             return
 
+        # Mouse look from the motion accumulated since the last frame
+        dx, dy = pygame.mouse.get_rel()
+        if dx or dy:
+            self.camera_yaw += dx * self.mouse_sensitivity
+            self.camera_pitch -= dy * self.mouse_sensitivity
+            self.camera_pitch = max(-89.0, min(89.0, self.camera_pitch))
+
         # Keyboard movement
         keys = pygame.key.get_pressed()
-        speed = self.move_speed * dt
+        move_forward = keys[K_w] - keys[K_s]
+        move_right = keys[K_d] - keys[K_a]
+        move_up = keys[K_SPACE] - keys[K_LCTRL]
+        if not (move_forward or move_right or move_up):
+            return
 
-        if keys[pygame.K_LSHIFT]:
+        speed = self.move_speed * dt
+        if keys[K_LSHIFT]:
             speed *= 3.0
 
-        yaw_rad = math.radians(self.camera_yaw)
-        pitch_rad = math.radians(self.camera_pitch)
-
-        forward = [
-            math.cos(pitch_rad) * math.sin(yaw_rad),
-            math.cos(pitch_rad) * math.cos(yaw_rad),
-            math.sin(pitch_rad)
-        ]
-        right = [
-            math.cos(yaw_rad),
-            -math.sin(yaw_rad),
-            0
-        ]
-
-        if keys[pygame.K_w]:
-            self.camera_pos[0] += forward[0] * speed
-            self.camera_pos[1] += forward[1] * speed
-            self.camera_pos[2] += forward[2] * speed
-        if keys[pygame.K_s]:
-            self.camera_pos[0] -= forward[0] * speed
-            self.camera_pos[1] -= forward[1] * speed
-            self.camera_pos[2] -= forward[2] * speed
-        if keys[pygame.K_a]:
-            self.camera_pos[0] -= right[0] * speed
-            self.camera_pos[1] -= right[1] * speed
-        if keys[pygame.K_d]:
-            self.camera_pos[0] += right[0] * speed
-            self.camera_pos[1] += right[1] * speed
-        if keys[pygame.K_SPACE]:
-            self.camera_pos[2] += speed
-        if keys[pygame.K_LCTRL]:
-            self.camera_pos[2] -= speed
+        pos = self.camera_pos
+        if move_forward or move_right:
+            forward, right = camera_vectors(self.camera_yaw, self.camera_pitch)
+            step_forward = move_forward * speed
+            step_right = move_right * speed
+            pos[0] += forward[0] * step_forward + right[0] * step_right
+            pos[1] += forward[1] * step_forward + right[1] * step_right
+            pos[2] += forward[2] * step_forward
+        if move_up:
+            pos[2] += move_up * speed
 
     def draw(self):
-        draw_start = time.perf_counter()
+        # Hot per-frame lookups bound to locals
+        perf_counter = time.perf_counter
+        profile = self.profile_data
+        wmb = self.wmb
+        draw_start = perf_counter()
+
+        if self.world_loading:
+            self.install_pending_world()
 
-        # Reset per-frame profiling counters
-        self.profile_data['texture_binds'] = 0
-        self.profile_data['draw_calls'] = 0
-        self.profile_data['triangles'] = 0
-        self.profile_data['blocks'] = 0
+        # Reset per-frame profiling counters; plain attributes, copied into profile_data once per frame
+        self._pf_binds = self._pf_calls = self._pf_tris = self._pf_blocks = 0
 
-        t0 = time.perf_counter()
+        t0 = perf_counter()
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glClearColor(0.4, 0.6, 0.8, 1.0)  # Sky blue
-        t1 = time.perf_counter()
-        self.profile_data['clear_time'] += t1 - t0
-
-        glLoadIdentity()
+        t1 = perf_counter()
+        profile['clear_time'] += t1 - t0
 
-        # Calculate look direction from yaw and pitch
-        yaw_rad = math.radians(self.camera_yaw)
-        pitch_rad = math.radians(self.camera_pitch)
-
-        # Forward vector (where camera is looking)
-        look_x = math.cos(pitch_rad) * math.sin(yaw_rad)
-        look_y = math.cos(pitch_rad) * math.cos(yaw_rad)
-        look_z = math.sin(pitch_rad)
-
-        # Camera position and look-at point
-        cx, cy, cz = self.camera_pos
-        gluLookAt(cx, cy, cz,
-                  cx + look_x, cy + look_y, cz + look_z,
-                  0, 0, 1)  # Z is up
+        # Camera from the cached yaw/pitch basis; culling reuses the same matrix
+        view = camera_view_matrix(self.camera_pos, self.camera_yaw, self.camera_pitch)
+        glLoadMatrixf(view)
+        self.view_projection = view @ self.projection
 
         if self.wireframe:
             glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
@@ -493,70 +402,75 @@ class WMBViewer:
         else:
             glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
 
-        t2 = time.perf_counter()
-        self.profile_data['setup_time'] += t2 - t1
+        t2 = perf_counter()
+        profile['setup_time'] += t2 - t1
 
         # Draw based on version
-        if self.wmb and self.wmb.version in [b'WMB4', b'WMB6']:
+        if wmb and wmb.version in (b'WMB4', b'WMB6'):
             self.draw_wmb6()
-        elif self.wmb:
+        elif wmb:
             self.draw_wmb7()
 
-        t3 = time.perf_counter()
-        self.profile_data['geometry_time'] += t3 - t2
+        t3 = perf_counter()
+        profile['geometry_time'] += t3 - t2
+        profile.update(texture_binds=self._pf_binds, draw_calls=self._pf_calls,
+                       triangles=self._pf_tris, blocks=self._pf_blocks)
 
         # Draw overlay
         self.draw_overlay()
 
-        t4 = time.perf_counter()
-        self.profile_data['overlay_time'] += t4 - t3
+        t4 = perf_counter()
+        profile['overlay_time'] += t4 - t3
 
         pygame.display.flip()
 
-        t5 = time.perf_counter()
-        self.profile_data['flip_time'] += t5 - t4
+        t5 = perf_counter()
+        profile['flip_time'] += t5 - t4
 
         # Profiling output
         if self.profile_enabled:
-            draw_time = time.perf_counter() - draw_start
-            self.profile_data['draw_total'] += draw_time
+            draw_time = perf_counter() - draw_start
+            profile['draw_total'] += draw_time
             self.frame_count += 1
 
             if self.frame_count >= self.profile_interval:
                 n = self.frame_count
-                avg_draw = (self.profile_data['draw_total'] / n) * 1000
+                avg_draw = (profile['draw_total'] / n) * 1000
                 avg_fps = 1000.0 / avg_draw if avg_draw > 0 else 0
-                avg_clear = (self.profile_data['clear_time'] / n) * 1000
-                avg_setup = (self.profile_data['setup_time'] / n) * 1000
-                avg_geom = (self.profile_data['geometry_time'] / n) * 1000
-                avg_overlay = (self.profile_data['overlay_time'] / n) * 1000
-                avg_flip = (self.profile_data['flip_time'] / n) * 1000
+                avg_clear = (profile['clear_time'] / n) * 1000
+                avg_setup = (profile['setup_time'] / n) * 1000
+                avg_geom = (profile['geometry_time'] / n) * 1000
+                avg_overlay = (profile['overlay_time'] / n) * 1000
+                avg_flip = (profile['flip_time'] / n) * 1000
                 print(f"[PROFILE] Frame: {avg_draw:.2f}ms ({avg_fps:.1f} FPS) | "
                       f"Clear: {avg_clear:.2f}ms | Setup: {avg_setup:.2f}ms | "
                       f"Geometry: {avg_geom:.2f}ms | Overlay: {avg_overlay:.2f}ms | "
                       f"Flip: {avg_flip:.2f}ms")
-                print(f"          Tex binds: {self.profile_data['texture_binds']} | "
-                      f"Draw calls: {self.profile_data['draw_calls']} | "
-                      f"Triangles: {self.profile_data['triangles']}")
+                print(f"          Tex binds: {profile['texture_binds']} | "
+                      f"Draw calls: {profile['draw_calls']} | "
+                      f"Triangles: {profile['triangles']}")
                 # Reset accumulators
-                self.profile_data['draw_total'] = 0.0
-                self.profile_data['clear_time'] = 0.0
-                self.profile_data['setup_time'] = 0.0
-                self.profile_data['geometry_time'] = 0.0
-                self.profile_data['overlay_time'] = 0.0
-                self.profile_data['flip_time'] = 0.0
+                profile['draw_total'] = 0.0
+                profile['clear_time'] = 0.0
+                profile['setup_time'] = 0.0
+                profile['geometry_time'] = 0.0
+                profile['overlay_time'] = 0.0
+                profile['flip_time'] = 0.0
                 self.frame_count = 0
 
     def draw_overlay(self):
         """Draw file info and controls overlay"""
         # Build extra info string
         extra_info = None
-        if self.wmb and not self.load_error:
-            version = self.wmb.version.decode() if self.wmb.version else 'Unknown'
-            if self.wmb.version in [b'WMB4', b'WMB6']:
-                extra_info = f"{version} | Faces: {len(self.wmb.faces)} | Textures: {len(self.wmb.textures)}"
+        wmb = self.wmb
+        if wmb and not self.load_error:
+            version = wmb.version.decode() if wmb.version else 'Unknown'
+            if wmb.version in (b'WMB4', b'WMB6'):
+                extra_info = f"{version} | Faces: {wmb.num_faces} | Textures: {len(wmb.textures)}"
             else:
-                extra_info = f"{version} | Blocks: {len(self.wmb.blocks)} | Textures: {len(self.wmb.textures)}"
+                extra_info = f"{version} | Blocks: {len(wmb.blocks)} | Textures: {len(wmb.textures)}"
+            if self.world_loading:
+                extra_info += " | Loading geometry..."
 
         controls = "WASD: move | Tab: release mouse | L: file list | F1: wireframe"
         if not self.mouse_captured:
@@ -569,31 +483,50 @@ class WMBViewer:
         )
 
     def draw_wmb6(self):
-        """Draw WMB6 level geometry using vertex arrays"""
-        if not self.render_batches:
+        """Draw WMB6 level geometry, replaying the compiled lists of the batches in view"""
+        if not self.render_batches or self.world_vbo is None:
             return
+        visible = frustum_visible(*self.world_bounds, self.view_projection)
+        self.count_batches(self.world_lists.call(self.wireframe, self.compile_wmb6, visible))
+
+    def compile_wmb6(self, lists):
+        """Issue the WMB6 batches from the static world buffers (recorded into per-batch display lists)"""
+        lists.setup()
 
-        # Enable vertex arrays
+        # Enable vertex arrays; all batches index one shared vertex table
+        glBindBuffer(GL_ARRAY_BUFFER, self.world_vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.world_ibo)
         glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, None)
 
+        # Texcoords come from each batch's texinfo planes applied to the object-space position
+        glTexGeni(GL_S, GL_TEXTURE_GEN_MODE, GL_OBJECT_LINEAR)
+        glTexGeni(GL_T, GL_TEXTURE_GEN_MODE, GL_OBJECT_LINEAR)
+        glEnable(GL_TEXTURE_GEN_S)
+        glEnable(GL_TEXTURE_GEN_T)
+
+        # Texture left bound by the previous batch (0 while texturing is off), so
+        # consecutive batches sharing a texture do not rebind it
+        bound = None
         for batch in self.render_batches:
             tex_idx = batch['texture_idx']
-            positions = batch['positions']
-            texcoords = batch['texcoords']
             vertex_count = batch['vertex_count']
 
             # Bind texture
-            has_texture = False
-            if not self.wireframe and tex_idx < len(self.texture_ids):
-                tex_id = self.texture_ids[tex_idx]
-                if tex_id is not None:
-                    glEnable(GL_TEXTURE_2D)
-                    glBindTexture(GL_TEXTURE_2D, tex_id)
-                    has_texture = True
-                    self.profile_data['texture_binds'] += 1
-
-            if not has_texture and not self.wireframe:
+            tex_id = None if self.wireframe else batch['gl_tex']
+            has_texture = tex_id is not None
+            if has_texture and tex_id != bound:
+                lists.state(binds=1)
+                glEnable(GL_TEXTURE_2D)
+                glBindTexture(GL_TEXTURE_2D, tex_id)
+                bound = tex_id
+
+            if not has_texture and not self.wireframe and bound != 0:
+                lists.state(binds=0)
                 glDisable(GL_TEXTURE_2D)
+                bound = 0
+
+            lists.batch(vertex_count // 3)
 
             # Set color based on texture for visibility
             if not has_texture:
@@ -601,90 +534,86 @@ class WMBViewer:
                 g = ((tex_idx * 71) % 200 + 55) / 255.0
                 b = ((tex_idx * 113) % 200 + 55) / 255.0
                 glColor3f(r, g, b)
-                glDisableClientState(GL_TEXTURE_COORD_ARRAY)
             else:
                 glColor3f(1.0, 1.0, 1.0)
-                glEnableClientState(GL_TEXTURE_COORD_ARRAY)
-                glTexCoordPointer(2, GL_FLOAT, 0, texcoords)
+                glTexGenfv(GL_S, GL_OBJECT_PLANE, batch['s_plane'])
+                glTexGenfv(GL_T, GL_OBJECT_PLANE, batch['t_plane'])
 
-            # Set vertex pointer and draw
-            glVertexPointer(3, GL_FLOAT, 0, positions)
-            glDrawArrays(GL_TRIANGLES, 0, vertex_count)
+            glDrawElements(GL_TRIANGLES, vertex_count, GL_UNSIGNED_INT, ctypes.c_void_p(batch['first'] * 4))
 
-            self.profile_data['triangles'] += vertex_count // 3
-            self.profile_data['draw_calls'] += 1
+        lists.teardown()
 
         # Disable vertex arrays
+        glDisable(GL_TEXTURE_GEN_S)
+        glDisable(GL_TEXTURE_GEN_T)
         glDisableClientState(GL_VERTEX_ARRAY)
-        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
 
     def draw_wmb7(self):
-        """Draw WMB7 blocks"""
-        for block in self.wmb.blocks:
-            self.draw_block(block)
-            self.profile_data['blocks'] += 1
-
-    def draw_block(self, block):
-        """Draw a single WMB7 block"""
-        vertices = block['vertices']
-        triangles = block['triangles']
-        skins = block['skins']
-
-        if not triangles:
+        """Draw WMB7 blocks, replaying the compiled lists of the batches in view"""
+        self._pf_blocks += len(self.wmb.blocks)
+        if not self.render_batches or self.world_vbo is None:
             return
+        visible = frustum_visible(*self.world_bounds, self.view_projection)
+        self.count_batches(self.world_lists.call(self.wireframe, self.compile_wmb7, visible))
 
-        skin_tris = {}
-        for tri in triangles:
-            skin_idx = tri['skin']
-            if skin_idx not in skin_tris:
-                skin_tris[skin_idx] = []
-            skin_tris[skin_idx].append(tri)
-
-        for skin_idx, tris in skin_tris.items():
-            if skin_idx < 0 or skin_idx >= len(skins):
-                continue
+    def count_batches(self, counts):
+        """Add the counts returned by a list replay to this frame's profiling counters"""
+        self._pf_binds += counts['texture_binds']
+        self._pf_calls += counts['draw_calls']
+        self._pf_tris += counts['triangles']
 
-            skin = skins[skin_idx]
-            tex_idx = skin['texture']
-            flags = skin['flags']
+    def compile_wmb7(self, lists):
+        """Issue the WMB7 material batches from the static world buffers (recorded into per-batch display lists)"""
+        lists.setup()
 
-            is_sky = (flags & 2) != 0
+        glBindBuffer(GL_ARRAY_BUFFER, self.world_vbo)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.world_ibo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glVertexPointer(3, GL_FLOAT, BATCH_STRIDE, None)
+        glTexCoordPointer(2, GL_FLOAT, BATCH_STRIDE, BATCH_UV_OFFSET)
 
-            if is_sky:
-                glColor3f(0.5, 0.7, 1.0)
-            else:
-                glColor3f(1.0, 1.0, 1.0)
+        # Texture left bound by the previous batch (0 while texturing is off), so
+        # consecutive batches sharing a texture do not rebind it
+        bound = None
+        for batch in self.render_batches:
+            vertex_count = batch['vertex_count']
 
-            has_texture = False
-            if not self.wireframe and tex_idx >= 0 and tex_idx < len(self.texture_ids):
-                tex_id = self.texture_ids[tex_idx]
-                if tex_id is not None:
-                    glEnable(GL_TEXTURE_2D)
-                    glBindTexture(GL_TEXTURE_2D, tex_id)
-                    has_texture = True
-                    self.profile_data['texture_binds'] += 1
+            tex_id = None if self.wireframe else batch['gl_tex']
+            has_texture = tex_id is not None
+            if has_texture and tex_id != bound:
+                lists.state(binds=1)
+                glEnable(GL_TEXTURE_2D)
+                glBindTexture(GL_TEXTURE_2D, tex_id)
+                bound = tex_id
 
-            if not has_texture and not self.wireframe:
+            if not has_texture and not self.wireframe and bound != 0:
+                lists.state(binds=0)
                 glDisable(GL_TEXTURE_2D)
+                bound = 0
 
-            glBegin(GL_TRIANGLES)
-            for tri in tris:
-                i1, i2, i3 = tri['indices']
-                self.profile_data['triangles'] += 1
+            lists.batch(vertex_count // 3)
 
-                for idx in [i1, i2, i3]:
-                    if idx < 0 or idx >= len(vertices):
-                        continue
+            if batch['sky']:
+                glColor3f(0.5, 0.7, 1.0)
+            else:
+                glColor3f(1.0, 1.0, 1.0)
 
-                    vert = vertices[idx]
+            # Client state is applied at compile time, the list keeps the dereferenced arrays
+            if has_texture:
+                glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            else:
+                glDisableClientState(GL_TEXTURE_COORD_ARRAY)
 
-                    if has_texture:
-                        glTexCoord2f(vert['uv'][0], vert['uv'][1])
+            glDrawElements(GL_TRIANGLES, vertex_count, GL_UNSIGNED_INT, ctypes.c_void_p(batch['first'] * 4))
 
-                    glVertex3f(vert['pos'][0], vert['pos'][1], vert['pos'][2])
+        lists.teardown()
 
-            glEnd()
-            self.profile_data['draw_calls'] += 1
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
 
     def run(self):
         clock = pygame.time.Clock()
@@ -708,6 +637,6 @@ class WMBViewer:
 
 
 if __name__ == "__main__":
-    folder = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
-    viewer = WMBViewer(folder)
+    folder, vsync = parse_viewer_args(sys.argv[1:])
+    viewer = WMBViewer(folder, vsync)
     viewer.run()